@@ -49,8 +49,6 @@ def build_tree(args) -> None:
     repository = OpeningTreeRepository(tree_path)
     service = OpeningTreeService(repository, max_ply=args.max_ply, min_rating=args.min_rating)
 
-    # Process each PGN file
-    total_files = len(pgn_paths)
-    for idx, pgn_path in enumerate(pgn_paths, 1):
-        print(f"Processing {pgn_path} ({idx}/{total_files})...")
-        service.process_pgn_file(pgn_path)
\ No newline at end of file
+    # Process the PGN files; multiple pending files parse in parallel
+    print(f"Processing {len(pgn_paths)} PGN file(s)...")
+    service.process_pgn_files(pgn_paths)
\ No newline at end of file
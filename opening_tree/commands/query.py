@@ -1,6 +1,7 @@
 from opening_tree.repository.database import OpeningTreeRepository
 from opening_tree.service.opening_tree import OpeningTreeService
-import json
+from opening_tree.service.api import dump_json
+import sys
 
 def query_tree(args) -> None:
     """Query the opening tree for a specific position."""
@@ -13,8 +14,6 @@ def query_tree(args) -> None:
         print(f"Position not found: {args.fen}")
         return
 
-    if args.output == "json":
-        print(json.dumps(result, indent=2))
-    else:
-        # TODO: Implement other output formats if needed
-        print(json.dumps(result, indent=2))
\ No newline at end of file
+    # JSON is the only output format for now; pretty-printed since a
+    # human is reading it
+    sys.stdout.buffer.write(dump_json(result, pretty=True) + b"\n")
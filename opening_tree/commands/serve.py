@@ -1,56 +1,133 @@
-from http.server import HTTPServer, BaseHTTPRequestHandler
-from urllib.parse import urlparse
+import functools
+import gzip
 import json
+import re
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import unquote
 from typing import Dict
 
-from opening_tree.service.api import OpeningTreeAPI, create_trees_from_config, load_config, get_trees_from_config
+from opening_tree.service.api import OpeningTreeAPI, create_trees_from_config, load_config, get_trees_from_config, dump_json
+
+# Single precompiled pattern for the fixed route set: "/" or
+# "/tree_name/segment", with an optional query string. One match replaces
+# the urlparse + strip + split churn on every request.
+_ROUTE = re.compile(r'^/(?:([^/?#]+)/([^/?#]+))?/?(?:\?.*)?$')
 
 class OpeningTreeHandler(BaseHTTPRequestHandler):
-    def __init__(self, api: OpeningTreeAPI, *args, **kwargs):
+    # HTTP/1.1 keeps connections open between requests; every response
+    # already carries Content-Length, so clients querying a whole
+    # variation pay the TCP handshake only once
+    protocol_version = 'HTTP/1.1'
+
+    def __init__(self, api: OpeningTreeAPI, list_payloads, cached_query, *args, **kwargs):
         self.api = api
+        self.list_payloads = list_payloads
+        self.cached_query = cached_query
         # Need to call parent's __init__ with original args
         super().__init__(*args, **kwargs)
 
-    def do_GET(self):
-        # Parse the URL path
-        parsed_path = urlparse(self.path)
-        path_segments = parsed_path.path.strip('/').split('/')
+    def send_json(self, payload: bytes, gz_payload: bytes = None):
+        """Send a JSON body, gzipped when the client accepts it.
 
-        # Route to appropriate handler
-        if not path_segments[0]:
-            self.handle_list_trees()
-        elif len(path_segments) == 2:
-            self.handle_query_position(path_segments[0], path_segments[1])
+        Query responses repeat move strings and FEN fragments, so they
+        compress well; level 1 keeps the CPU cost minimal.
+        """
+        if 'gzip' in (self.headers.get('Accept-Encoding') or ''):
+            if gz_payload is None:
+                gz_payload = gzip.compress(payload, compresslevel=1)
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Content-Length', str(len(gz_payload)))
+            self.end_headers()
+            self.wfile.write(gz_payload)
         else:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    def do_GET(self):
+        match = _ROUTE.match(self.path)
+        if match is None:
             self.send_error(400, "Invalid URL format. Expected: /tree_name/fen")
+        elif match.group(1) is None:
+            self.handle_list_trees()
+        else:
+            self.handle_query_position(match.group(1), match.group(2))
+
+    def do_POST(self):
+        match = _ROUTE.match(self.path)
+        if match is not None and match.group(2) == 'batch':
+            self.handle_batch_query(match.group(1))
+        else:
+            self.send_error(400, "Invalid URL format. Expected: /tree_name/batch")
+
+    def handle_batch_query(self, tree_name: str):
+        """Handle POST request querying many FENs in one round-trip.
+
+        The body is a JSON array of FEN strings; the response is an array
+        of query results in the same order (null for unknown positions).
+        Amortizes HTTP and handler overhead across a whole variation.
+        """
+        try:
+            content_length = int(self.headers.get('Content-Length', 0))
+            fens = json.loads(self.rfile.read(content_length))
+        except (ValueError, TypeError):
+            self.send_error(400, "Request body must be valid JSON")
+            return
+
+        results, status_code, error_message = self.api.query_positions(tree_name, fens)
+        if status_code != 200:
+            self.send_error(status_code, error_message)
+            return
+
+        self.send_json(dump_json(results))
 
     def handle_list_trees(self):
-        """Handle GET request for root path - list available trees."""
-        tree_list = self.api.list_trees()
+        """Handle GET request for root path - list available trees.
 
-        self.send_response(200)
-        self.send_header('Content-Type', 'application/json')
-        self.end_headers()
-        self.wfile.write(json.dumps(tree_list, indent=2).encode())
+        The tree set is fixed at startup, so both the plain and gzipped
+        payloads are precomputed once in create_handler and written
+        verbatim.
+        """
+        self.send_json(*self.list_payloads)
 
     def handle_query_position(self, tree_name: str, encoded_fen: str):
-        """Handle GET request for position query in a specific tree."""
-        result, status_code, error_message = self.api.query_position(tree_name, encoded_fen)
-        
+        """Handle GET request for position query in a specific tree.
+
+        Responses are served from an LRU cache of pre-serialized bodies;
+        popular positions dominate query traffic and the trees are opened
+        read-only, so cached entries never go stale.
+        """
+        # Skip percent-decoding when there is nothing to decode
+        fen = encoded_fen if '%' not in encoded_fen else unquote(encoded_fen)
+        payload, gz_payload, status_code, error_message = self.cached_query(tree_name, fen)
+
         if status_code != 200:
             self.send_error(status_code, error_message)
             return
 
-        # Send successful response
-        self.send_response(200)
-        self.send_header('Content-Type', 'application/json')
-        self.end_headers()
-        self.wfile.write(json.dumps(result, indent=2).encode())
+        self.send_json(payload, gz_payload)
 
 def create_handler(api: OpeningTreeAPI):
     """Create a handler class with the API instance."""
+    # Serialize the tree list once; it cannot change while serving
+    list_payload = dump_json(api.list_trees())
+    list_payloads = (list_payload, gzip.compress(list_payload, compresslevel=1))
+
+    @functools.lru_cache(maxsize=8192)
+    def cached_query(tree_name: str, fen: str):
+        """Query a position and cache both serialized response bodies."""
+        result, status_code, error_message = api.query_position(tree_name, fen)
+        if status_code != 200:
+            return None, None, status_code, error_message
+        payload = dump_json(result)
+        return payload, gzip.compress(payload, compresslevel=1), 200, ""
+
     def handler(*args, **kwargs):
-        return OpeningTreeHandler(api, *args, **kwargs)
+        return OpeningTreeHandler(api, list_payloads, cached_query, *args, **kwargs)
     return handler
 
 def serve_tree(args) -> None:
@@ -100,7 +177,9 @@ def serve_tree(args) -> None:
     
     # Create and start the server
     handler = create_handler(api)
-    server = HTTPServer((domain, port), handler)
+    # ThreadingHTTPServer handles each request on its own thread, so one
+    # slow query no longer stalls every other client
+    server = ThreadingHTTPServer((domain, port), handler)
 
     print(f"Starting server on {protocol}://{domain}:{port}")
     if args.config:
@@ -1,54 +1,98 @@
-from opening_tree.repository.database import OpeningTreeRepository
+import multiprocessing
+
+from opening_tree.repository.database import OpeningTreeRepository, fen_hash
 from opening_tree.service.fen_utils import normalise_fen
 
+# Changed positions per transaction; one fsync per batch instead of one
+# per fixed position
+BATCH_COMMIT_INTERVAL = 10_000
+
+# Rows pickled to each worker per task; large enough to amortize IPC
+POOL_CHUNKSIZE = 1024
+
+
+def _normalise_worker(row):
+    """Normalise one (id, fen) row; returns None for unchanged rows.
+
+    Runs in a pool worker. Unchanged rows (the vast majority) are
+    filtered here so they never pay the return trip to the parent.
+    """
+    position_id, fen = row
+    try:
+        new_fen = normalise_fen(fen)
+    except Exception:
+        return None
+    if new_fen == fen:
+        return None
+    return position_id, fen, new_fen
+
 
 def fix_fens(args) -> None:
     repo = OpeningTreeRepository(args.tree)
     conn = repo.conn
 
-    cursor = conn.execute("SELECT id, fen FROM positions")
-    positions = cursor.fetchall()
+    # One bulk scan instead of per-row SELECTs inside the loop: FEN -> id
+    # lookups happen at dict speed
+    fen_to_id = dict(conn.execute("SELECT fen, id FROM positions"))
 
-    total = len(positions)
-    fixed = 0
-    merged = 0
-    processed = 0
+    # The set-based merge statements below rely on this index for both
+    # the EXISTS probes and the OR IGNORE conflict checks
+    conn.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_moves_triple "
+        "ON moves (from_position_id, to_position_id, move)"
+    )
+
+    total = 0
     progress_printed = False
 
-    for old_id, fen in positions:
-        processed += 1
-        if processed % 20000 == 0:
-            print("#", end="", flush=True)
-            progress_printed = True
-        try:
-            new_fen = normalise_fen(fen)
-        except Exception:
-            continue
+    # Phase 1: normalise across all cores. normalise_fen is pure CPU, so
+    # a process pool overlaps the parsing while this process streams the
+    # cursor; only rows that actually change come back.
+    changed = []
+    cursor = conn.execute("SELECT id, fen FROM positions")
+    cursor.arraysize = POOL_CHUNKSIZE
+    with multiprocessing.Pool() as pool:
+        for result in pool.imap_unordered(_normalise_worker, cursor, chunksize=POOL_CHUNKSIZE):
+            total += 1
+            if total % 20000 == 0:
+                print("#", end="", flush=True)
+                progress_printed = True
+            if result is not None:
+                changed.append(result)
 
-        if new_fen == fen:
-            continue
+    fixed = 0
+    merged = 0
+    changes = 0
 
-        row = conn.execute("SELECT id FROM positions WHERE fen = ?", (new_fen,)).fetchone()
-
-        if args.dry_run:
-            if row is None:
-                fixed += 1
-                if getattr(args, "show_details", False):
-                    print(f"UPDATE positions SET fen = '{new_fen}' WHERE id = {old_id}")
-            else:
-                merged += 1
-                if getattr(args, "show_details", False):
-                    print(f"MERGE position {old_id} -> {row[0]} ({fen} -> {new_fen})")
-            continue
+    # Simple FEN rewrites are accumulated and flushed with executemany;
+    # merges mutate dependent rows and stay inline within the transaction
+    pending_fen_updates = []
 
+    dry_run = getattr(args, "dry_run", False)
+    if not dry_run:
         conn.execute("BEGIN TRANSACTION")
-        try:
-            if row is None:
-                conn.execute("UPDATE positions SET fen = ? WHERE id = ?", (new_fen, old_id))
+    try:
+        # Phase 2: apply mutations serially on the one writer connection
+        for old_id, fen, new_fen in changed:
+            new_id = fen_to_id.get(new_fen)
+
+            if dry_run:
+                if new_id is None:
+                    fixed += 1
+                    if getattr(args, "show_details", False):
+                        print(f"UPDATE positions SET fen = '{new_fen}' WHERE id = {old_id}")
+                else:
+                    merged += 1
+                    if getattr(args, "show_details", False):
+                        print(f"MERGE position {old_id} -> {new_id} ({fen} -> {new_fen})")
+                continue
+
+            if new_id is None:
+                pending_fen_updates.append((new_fen, fen_hash(new_fen), old_id))
+                fen_to_id.pop(fen, None)
+                fen_to_id[new_fen] = old_id
                 fixed += 1
             else:
-                new_id = row[0]
-
                 stats_row = conn.execute(
                     """
                     SELECT total_games, white_wins, black_wins, draws,
@@ -79,61 +123,76 @@ def fix_fens(args) -> None:
                                 ELSE game_ref
                             END
                         """,
-                        (
-                            new_id,
-                            stats_row[0], stats_row[1], stats_row[2], stats_row[3],
-                            stats_row[4], stats_row[5], stats_row[6], stats_row[7]
-                        )
+                        (new_id, *stats_row)
                     )
 
-                rows = conn.execute(
-                    "SELECT id, to_position_id, move FROM moves WHERE from_position_id = ?",
-                    (old_id,)
-                ).fetchall()
-                for move_id, to_id, move_san in rows:
-                    exists = conn.execute(
-                        "SELECT id FROM moves WHERE from_position_id = ? AND to_position_id = ? AND move = ?",
-                        (new_id, to_id, move_san)
-                    ).fetchone()
-                    if exists:
-                        conn.execute("DELETE FROM moves WHERE id = ?", (move_id,))
-                    else:
-                        conn.execute(
-                            "UPDATE moves SET from_position_id = ? WHERE id = ?",
-                            (new_id, move_id)
-                        )
-
-                rows = conn.execute(
-                    "SELECT id, from_position_id, move FROM moves WHERE to_position_id = ?",
-                    (old_id,)
-                ).fetchall()
-                for move_id, from_id, move_san in rows:
-                    exists = conn.execute(
-                        "SELECT id FROM moves WHERE from_position_id = ? AND to_position_id = ? AND move = ?",
-                        (from_id, new_id, move_san)
-                    ).fetchone()
-                    if exists:
-                        conn.execute("DELETE FROM moves WHERE id = ?", (move_id,))
-                    else:
-                        conn.execute(
-                            "UPDATE moves SET to_position_id = ? WHERE id = ?",
-                            (new_id, move_id)
-                        )
+                # Remap moves set-wise: drop rows the merge target already
+                # has, then retarget the rest in one statement per direction
+                conn.execute(
+                    """
+                    DELETE FROM moves WHERE from_position_id = ? AND EXISTS (
+                        SELECT 1 FROM moves m2
+                        WHERE m2.from_position_id = ?
+                          AND m2.to_position_id = moves.to_position_id
+                          AND m2.move = moves.move
+                    )
+                    """,
+                    (old_id, new_id)
+                )
+                conn.execute(
+                    "UPDATE OR IGNORE moves SET from_position_id = ? WHERE from_position_id = ?",
+                    (new_id, old_id)
+                )
+                conn.execute(
+                    """
+                    DELETE FROM moves WHERE to_position_id = ? AND EXISTS (
+                        SELECT 1 FROM moves m2
+                        WHERE m2.to_position_id = ?
+                          AND m2.from_position_id = moves.from_position_id
+                          AND m2.move = moves.move
+                    )
+                    """,
+                    (old_id, new_id)
+                )
+                conn.execute(
+                    "UPDATE OR IGNORE moves SET to_position_id = ? WHERE to_position_id = ?",
+                    (new_id, old_id)
+                )
 
                 conn.execute("DELETE FROM position_statistics WHERE position_id = ?", (old_id,))
                 conn.execute("DELETE FROM positions WHERE id = ?", (old_id,))
 
+                fen_to_id.pop(fen, None)
                 merged += 1
 
+            changes += 1
+            if changes % BATCH_COMMIT_INTERVAL == 0:
+                if pending_fen_updates:
+                    conn.executemany(
+                        "UPDATE positions SET fen = ?, fen_hash = ? WHERE id = ?",
+                        pending_fen_updates
+                    )
+                    pending_fen_updates.clear()
+                conn.commit()
+                conn.execute("BEGIN TRANSACTION")
+
+        if not dry_run:
+            if pending_fen_updates:
+                conn.executemany(
+                    "UPDATE positions SET fen = ?, fen_hash = ? WHERE id = ?",
+                    pending_fen_updates
+                )
+                pending_fen_updates.clear()
             conn.commit()
-        except Exception:
+    except Exception:
+        if not dry_run:
             conn.rollback()
-            raise
+        raise
 
     if progress_printed:
         print()
     print(f"Processed positions: {total}")
     print(f"Updated FENs: {fixed}")
     print(f"Merged positions: {merged}")
-    if not getattr(args, "dry_run", False):
+    if not dry_run:
         conn.execute("VACUUM")
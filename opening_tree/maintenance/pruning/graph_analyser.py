@@ -19,21 +19,12 @@ class GraphAnalyser:
 
         Args:
             max_steps: Maximum steps away from core positions to consider
-            batch_size: Number of positions to process in each batch
+            batch_size: Unused; kept for interface compatibility
+
+        Returns number of positions assigned a closeness.
         """
-        # First, identify positions directly reachable from core positions
-        positions_updated = self.repository.mark_positions_near_core(max_steps)
+        # The whole BFS runs inside SQLite as one recursive CTE
+        positions_updated = self.repository.calculate_closeness_cte(max_steps)
         if progress_callback:
-            progress_callback("Positions 1 step from core", positions_updated)
-        if not positions_updated:
-            return
-
-        # Then propagate closeness values to positions reachable from those
-        remaining_steps = max_steps - 1
-        while remaining_steps > 0:
-            positions_updated = self.repository.update_closeness_batch(remaining_steps)
-            if progress_callback:
-                progress_callback(f"Positions {max_steps - remaining_steps + 1} steps from core", positions_updated)
-            if not positions_updated:
-                break
-            remaining_steps -= 1
+            progress_callback(f"Positions within {max_steps} steps of core", positions_updated)
+        return positions_updated
@@ -1,68 +1,207 @@
+import sqlite3
 from contextlib import contextmanager
-from typing import List
+from typing import List, Tuple
+
+# UPDATE ... FROM needs SQLite 3.33; older versions fall back to a
+# correlated subquery
+_HAS_UPDATE_FROM = sqlite3.sqlite_version_info >= (3, 33)
+
+# The MATERIALIZED hint (3.35+) guarantees the BFS result is computed
+# once into a transient btree rather than re-evaluated where the CTE is
+# referenced more than once
+_MATERIALIZED = "MATERIALIZED" if sqlite3.sqlite_version_info >= (3, 35) else ""
+
+_SQL_BFS_CTE = f"""
+    WITH RECURSIVE bfs(position_id, closeness) AS {_MATERIALIZED} (
+        SELECT m.to_position_id, ?
+        FROM main_tree.moves m
+        JOIN main_tree.position_statistics ps
+            ON ps.position_id = m.from_position_id
+        WHERE ps.total_games > 1
+        UNION
+        SELECT m.to_position_id, bfs.closeness - 1
+        FROM bfs
+        JOIN position_closeness pc
+            ON pc.position_id = bfs.position_id
+        JOIN main_tree.moves m
+            ON m.from_position_id = bfs.position_id
+        WHERE bfs.closeness > 1
+    )
+"""
+
+_SQL_CLOSENESS_UPDATE_FROM = _SQL_BFS_CTE + """
+    UPDATE position_closeness
+    SET closeness = src.closeness
+    FROM (
+        SELECT position_id, MAX(closeness) AS closeness
+        FROM bfs GROUP BY position_id
+    ) src
+    WHERE position_closeness.position_id = src.position_id
+"""
+
+_SQL_CLOSENESS_UPDATE_IN = _SQL_BFS_CTE + """
+    UPDATE position_closeness
+    SET closeness = (
+            SELECT MAX(b.closeness) FROM bfs b
+            WHERE b.position_id = position_closeness.position_id
+        )
+    WHERE position_id IN (SELECT position_id FROM bfs)
+"""
 
 class PruningRepository:
-    def __init__(self, conn):
+    def __init__(self, conn, read_conn=None):
         self.conn = conn
+        # Explicit transaction control: transaction() issues its own
+        # BEGIN IMMEDIATE, so the driver must not start deferred
+        # transactions behind our back
+        self.conn.isolation_level = None
+        self.tune_connection()
+        # Progress and batch reads go through a second connection when
+        # one is provided, so they see the last committed WAL snapshot
+        # without serialising against a long write transaction
+        self.read_conn = read_conn if read_conn is not None else conn
+        self._main_tree_path = None
+
+    def tune_connection(self):
+        """Apply performance PRAGMAs for the pruning workload.
+
+        Pruning is long runs of writes and large scans, so WAL with
+        relaxed syncs turns per-commit fsyncs into page-cache writes,
+        and a big cache plus memory temp store keeps the working set
+        off disk."""
+        self.conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            PRAGMA temp_store=MEMORY;
+            PRAGMA cache_size=-262144;
+            PRAGMA mmap_size=1073741824;
+            PRAGMA busy_timeout=5000;
+        """)
+
+    def set_read_connection(self, read_conn):
+        """Route read-only queries through a dedicated connection.
+
+        The main tree is attached read-only so leaf detection can join
+        against it from the reader side too."""
+        if self._main_tree_path is not None:
+            read_conn.execute(
+                'ATTACH DATABASE ? AS main_tree',
+                (f'file:{self._main_tree_path}?mode=ro',)
+            )
+        self.read_conn = read_conn
 
     def attach_main_database(self, main_tree_path: str):
         """Attach the main database for pruning operations."""
+        self._main_tree_path = main_tree_path
         self.conn.execute('ATTACH DATABASE ? AS main_tree', (main_tree_path,))
+        # The attached tree carries the bulk of the reads and deletes,
+        # so it gets the same journal and cache treatment
+        self.conn.executescript("""
+            PRAGMA main_tree.journal_mode=WAL;
+            PRAGMA main_tree.synchronous=NORMAL;
+            PRAGMA main_tree.cache_size=-262144;
+            PRAGMA main_tree.mmap_size=1073741824;
+        """)
 
     def detach_main_database(self):
         """Detach the main database after pruning operations."""
         self.conn.execute('DETACH DATABASE main_tree')
+        if self.read_conn is not self.conn:
+            self.read_conn.execute('DETACH DATABASE main_tree')
 
     def create_schema(self):
         """Create the workspace schema for pruning operations."""
         self.conn.executescript("""
-            -- Track positions and their closeness to core nodes
+            -- Track positions and their closeness to core nodes;
+            -- closeness 0 doubles as the "unprocessed" marker since the
+            -- BFS never assigns a value below 1
             CREATE TABLE position_closeness (
                 position_id INTEGER PRIMARY KEY,
-                closeness INTEGER DEFAULT 0,
-                processed BOOLEAN DEFAULT FALSE
+                closeness INTEGER DEFAULT 0
             );
 
-            -- Index for efficient closeness updates
-            CREATE INDEX idx_position_closeness_unprocessed
-            ON position_closeness(processed, closeness);
+            -- Partial index over just the unprocessed frontier; it
+            -- shrinks as pruning proceeds instead of indexing every row
+            CREATE INDEX idx_pc_unprocessed
+            ON position_closeness(position_id) WHERE closeness = 0;
 
             -- Track positions that need to be deleted
             CREATE TABLE positions_to_delete (
                 position_id INTEGER PRIMARY KEY
             );
+
+            -- Reusable staging table for deletion batches; joining
+            -- against it supports batches of any size without hitting
+            -- SQLite's bound-parameter limit
+            CREATE TEMP TABLE IF NOT EXISTS del_ids (
+                id INTEGER PRIMARY KEY
+            ) WITHOUT ROWID;
         """)
 
     def ensure_main_tree_indexes(self):
-        """Ensure necessary indexes exist on the main tree database."""
-        try:
-            # Check if the index already exists by querying the attached database
-            cursor = self.conn.execute("""
-                SELECT name FROM main_tree.sqlite_master
-                WHERE type='index' AND name='idx_moves_stats_join'
+        """Create the indexes the pruning queries need on the main tree.
+
+        The BFS join probes position_statistics by position_id with a
+        total_games > 1 predicate, so a partial index over just the core
+        rows keeps it tiny. Frontier expansion and leaf detection probe
+        moves by from_position_id; trees built by the current schema
+        already cover that through idx_moves_triple, so the extra index
+        is only created for trees that predate it."""
+        self.conn.execute("""
+            CREATE INDEX IF NOT EXISTS main_tree.idx_ps_core
+            ON position_statistics(position_id) WHERE total_games > 1
+        """)
+        has_triple = self.conn.execute("""
+            SELECT name FROM main_tree.sqlite_master
+            WHERE type='index' AND name='idx_moves_triple'
+        """).fetchone()
+        if not has_triple:
+            self.conn.execute("""
+                CREATE INDEX IF NOT EXISTS main_tree.idx_moves_from_to
+                ON moves(from_position_id, to_position_id)
             """)
-            if not cursor.fetchone():
-                # Index doesn't exist, but we can't create it on attached DB
-                # Log a warning or handle as needed
-                pass
-        except Exception:
-            # If we can't check/create the index, continue without it
-            pass
+        # The deletes filter moves by to_position_id, which no ingest
+        # index covers; without this each deletion pass scans the whole
+        # moves table for the to-side
+        self.conn.execute("""
+            CREATE INDEX IF NOT EXISTS main_tree.idx_moves_to
+            ON moves(to_position_id)
+        """)
+        # Freshly built trees carry no sqlite_stat1 rows, leaving the
+        # planner blind when it orders the BFS joins; a bounded ANALYZE
+        # gives it real row counts for the new indexes
+        self.conn.execute("PRAGMA analysis_limit=1000")
+        self.conn.execute("ANALYZE main_tree")
+
+    def count_tree_positions(self) -> int:
+        """Count every position in the attached main tree."""
+        cursor = self.read_conn.execute("SELECT COUNT(*) FROM main_tree.positions")
+        return cursor.fetchone()[0]
+
+    def get_stats(self) -> Tuple[int, int, int]:
+        """Fetch all three progress counts in one round trip.
+
+        Returns (total positions analysed, positions assigned a
+        closeness, positions marked for deletion)."""
+        cursor = self.read_conn.execute("""
+            SELECT
+                (SELECT COUNT(*) FROM position_closeness),
+                (SELECT COUNT(*) FROM position_closeness WHERE closeness != 0),
+                (SELECT COUNT(*) FROM positions_to_delete)
+        """)
+        return cursor.fetchone()
 
     def count_positions(self) -> int:
-        """Count total positions being analyzed."""
-        cursor = self.conn.execute("SELECT COUNT(*) FROM position_closeness")
-        return cursor.fetchone()[0]
+        """Count total positions being analyzed. Prefer get_stats()."""
+        return self.get_stats()[0]
 
     def count_marked_positions(self) -> int:
-        """Count positions marked for deletion."""
-        cursor = self.conn.execute("SELECT COUNT(*) FROM position_closeness WHERE processed = TRUE")
-        return cursor.fetchone()[0]
+        """Count positions assigned a closeness by the BFS. Prefer get_stats()."""
+        return self.get_stats()[1]
 
     def count_positions_to_delete(self) -> int:
-        """Count positions marked for deletion."""
-        cursor = self.conn.execute("SELECT COUNT(*) FROM positions_to_delete")
-        return cursor.fetchone()[0]
+        """Count positions marked for deletion. Prefer get_stats()."""
+        return self.get_stats()[2]
 
     def initialize_single_game_positions(self) -> int:
         """Initialize position_closeness table with single-game positions.
@@ -78,80 +217,26 @@ class PruningRepository:
             """)
             return cursor.rowcount
 
-    def mark_positions_near_core(self, initial_closeness: int) -> int:
-        """Mark positions directly reachable from core positions.
-        Returns number of positions updated."""
-        with self.transaction() as conn:
-            # Create temporary batch table
-            conn.execute("""
-                CREATE TEMPORARY TABLE batch_positions (
-                    position_id INTEGER PRIMARY KEY
-                )
-            """)
-
-            # Insert batch of positions to process
-            cursor = conn.execute("""
-                INSERT INTO batch_positions (position_id)
-                SELECT DISTINCT m.to_position_id
-                FROM main_tree.moves m
-                JOIN main_tree.position_statistics ps1 ON m.from_position_id = ps1.position_id
-                JOIN main_tree.position_statistics ps2 ON m.to_position_id = ps2.position_id
-                WHERE ps1.total_games > 1
-                AND ps2.total_games = 1;
-            """)
-
-            # Update positions using the temporary table
-            cursor = conn.execute("""
-                UPDATE position_closeness
-                SET closeness = ?, processed = TRUE
-                WHERE position_id IN (SELECT position_id FROM batch_positions)
-            """, (initial_closeness,))
-
-            rows_updated = cursor.rowcount
-
-            # Drop the temporary table
-            conn.execute("DROP TABLE batch_positions")
+    def calculate_closeness_cte(self, max_steps: int) -> int:
+        """Propagate closeness from core positions in one recursive CTE.
 
-            return rows_updated
+        Performs the whole forward BFS inside SQLite: the base case is
+        every position one move away from a core position (more than one
+        game), and each recursion step walks one move further through
+        single-game positions, decrementing closeness until it reaches 1
+        or the frontier empties. Replaces one round-tripped UPDATE per
+        BFS level with a single statement.
 
-    def update_closeness_batch(self, current_closeness: int) -> int:
-        """Update closeness for positions reachable from higher closeness positions.
         Returns number of positions updated."""
+        # UPDATE ... FROM drives the write from the aggregated BFS result
+        # in one join instead of a correlated subquery per row
+        sql = _SQL_CLOSENESS_UPDATE_FROM if _HAS_UPDATE_FROM else _SQL_CLOSENESS_UPDATE_IN
         with self.transaction() as conn:
-            # Create temporary batch table
-            conn.execute("""
-                CREATE TEMPORARY TABLE batch_positions (
-                    position_id INTEGER PRIMARY KEY
-                )
-            """)
-
-            # Insert batch of positions to process
-            cursor = conn.execute("""
-                INSERT INTO batch_positions (position_id)
-                SELECT DISTINCT m.to_position_id
-                FROM main_tree.moves m
-                JOIN position_closeness pd
-                    ON m.from_position_id = pd.position_id
-                JOIN position_closeness target
-                    ON m.to_position_id = target.position_id
-                WHERE pd.closeness = ?
-                AND target.closeness = 0
-                AND target.processed = FALSE
-            """, (current_closeness + 1,))
-
-            # Update positions using the temporary table
-            cursor = conn.execute("""
-                UPDATE position_closeness
-                SET closeness = ?, processed = TRUE
-                WHERE position_id IN (SELECT position_id FROM batch_positions)
-            """, (current_closeness,))
-
-            rows_updated = cursor.rowcount
-
-            # Drop the temporary table
-            conn.execute("DROP TABLE batch_positions")
-
-            return rows_updated
+            # cursor.rowcount is -1 for WITH-prefixed statements, so take
+            # a total_changes delta instead
+            changes_before = conn.total_changes
+            conn.execute(sql, (max_steps,))
+            return conn.total_changes - changes_before
 
     def mark_positions_for_deletion(self) -> int:
         """Mark unreachable positions for deletion.
@@ -166,66 +251,199 @@ class PruningRepository:
             return cursor.rowcount
 
     def get_leaf_positions_for_deletion(self, batch_size: int) -> List[int]:
-        """Get a batch of leaf positions (no outgoing moves) marked for deletion."""
-        cursor = self.conn.execute("""
+        """Get a batch of leaf positions (no outgoing moves) marked for deletion.
+
+        Written as a left anti-join rather than NOT EXISTS so the
+        planner resolves each probe with one indexed lookup on
+        moves(from_position_id)."""
+        cursor = self.read_conn.execute("""
             SELECT ptd.position_id
             FROM positions_to_delete ptd
-            WHERE NOT EXISTS (
-                SELECT 1 FROM main_tree.moves m
-                WHERE m.from_position_id = ptd.position_id
-            )
+            LEFT JOIN main_tree.moves m
+                ON m.from_position_id = ptd.position_id
+            WHERE m.from_position_id IS NULL
             LIMIT ?
         """, (batch_size,))
         return [row[0] for row in cursor.fetchall()]
 
     def get_positions_for_deletion(self, batch_size: int) -> List[int]:
         """Get a batch of any positions marked for deletion."""
-        cursor = self.conn.execute("""
+        cursor = self.read_conn.execute("""
             SELECT position_id FROM positions_to_delete
             LIMIT ?
         """, (batch_size,))
         return [row[0] for row in cursor.fetchall()]
 
     def delete_positions(self, position_ids: List[int]):
-        """Delete the specified positions and their related data."""
+        """Delete the specified positions and their related data.
+
+        The batch is staged into the del_ids temp table so the deletes
+        join against an indexed set instead of a parsed IN-list, which
+        also lifts the bound-parameter cap on batch size."""
         if not position_ids:
             return
 
-        placeholders = ",".join("?" * len(position_ids))
+        # Single-row batches skip the staging table; direct parameter
+        # binding reuses the same four cached statements every call
+        if len(position_ids) == 1:
+            position_id = position_ids[0]
+            with self.transaction() as conn:
+                # Split by direction: SQLite will not index-merge an OR,
+                # so each DELETE gets its own index
+                conn.execute(
+                    "DELETE FROM main_tree.moves WHERE from_position_id = ?",
+                    (position_id,)
+                )
+                conn.execute(
+                    "DELETE FROM main_tree.moves WHERE to_position_id = ?",
+                    (position_id,)
+                )
+                conn.execute(
+                    "DELETE FROM main_tree.position_statistics WHERE position_id = ?",
+                    (position_id,)
+                )
+                conn.execute(
+                    "DELETE FROM main_tree.positions WHERE id = ?",
+                    (position_id,)
+                )
+                conn.execute(
+                    "DELETE FROM positions_to_delete WHERE position_id = ?",
+                    (position_id,)
+                )
+            return
+
         with self.transaction() as conn:
-            # Delete from dependent tables first
-            conn.execute(
-                f"DELETE FROM main_tree.moves WHERE from_position_id IN ({placeholders}) "
-                f"OR to_position_id IN ({placeholders})",
-                position_ids * 2
+            conn.execute("DELETE FROM del_ids")
+            conn.executemany(
+                "INSERT INTO del_ids (id) VALUES (?)",
+                ((position_id,) for position_id in position_ids)
             )
 
+            # Delete from dependent tables first, one statement per move
+            # direction since SQLite will not index-merge an OR
             conn.execute(
-                f"DELETE FROM main_tree.position_statistics WHERE position_id IN ({placeholders})",
-                position_ids
+                "DELETE FROM main_tree.moves "
+                "WHERE from_position_id IN (SELECT id FROM del_ids)"
             )
-
             conn.execute(
-                f"DELETE FROM main_tree.positions WHERE id IN ({placeholders})",
-                position_ids
+                "DELETE FROM main_tree.moves "
+                "WHERE to_position_id IN (SELECT id FROM del_ids)"
+            )
+            conn.execute(
+                "DELETE FROM main_tree.position_statistics "
+                "WHERE position_id IN (SELECT id FROM del_ids)"
             )
-
             conn.execute(
-                f"DELETE FROM positions_to_delete WHERE position_id IN ({placeholders})",
-                position_ids
+                "DELETE FROM main_tree.positions "
+                "WHERE id IN (SELECT id FROM del_ids)"
             )
+            conn.execute(
+                "DELETE FROM positions_to_delete "
+                "WHERE position_id IN (SELECT id FROM del_ids)"
+            )
+
+    def delete_all_tree_positions(self) -> int:
+        """Delete every unreachable position in one pass.
+
+        Reads the doomed set straight from position_closeness (closeness
+        still 0 after the BFS means unreachable), so no staging into
+        positions_to_delete is needed. Deleting a position also removes
+        the moves into and out of it, so the whole set goes in a single
+        transaction of set-wise deletes. Rows staged by the batched API
+        are cleared too in case a caller mixed both paths.
+
+        Returns number of positions deleted."""
+        with self.transaction() as conn:
+            conn.execute("""
+                DELETE FROM main_tree.moves
+                WHERE from_position_id IN
+                    (SELECT position_id FROM position_closeness WHERE closeness = 0)
+            """)
+            conn.execute("""
+                DELETE FROM main_tree.moves
+                WHERE to_position_id IN
+                    (SELECT position_id FROM position_closeness WHERE closeness = 0)
+            """)
+            conn.execute("""
+                DELETE FROM main_tree.position_statistics
+                WHERE position_id IN
+                    (SELECT position_id FROM position_closeness WHERE closeness = 0)
+            """)
+            conn.execute("""
+                DELETE FROM main_tree.positions
+                WHERE id IN
+                    (SELECT position_id FROM position_closeness WHERE closeness = 0)
+            """)
+            conn.execute("DELETE FROM positions_to_delete")
+            cursor = conn.execute("DELETE FROM position_closeness WHERE closeness = 0")
+            return cursor.rowcount
+
+    def drop_moves_indexes(self):
+        """Drop every index on main_tree.moves ahead of a massive delete.
+
+        When a large fraction of the tree is going away, each deleted row
+        pays B-tree rebalancing on every moves index; dropping them first
+        and rebuilding afterwards turns that into one bulk index build.
+        The statistics and positions deletes key on their rowid primary
+        keys, so only the moves indexes are worth dropping."""
+        self.conn.execute("DROP INDEX IF EXISTS main_tree.idx_moves_triple")
+        self.conn.execute("DROP INDEX IF EXISTS main_tree.idx_moves_from_position")
+        self.conn.execute("DROP INDEX IF EXISTS main_tree.idx_moves_from_to")
+        self.conn.execute("DROP INDEX IF EXISTS main_tree.idx_moves_to")
+
+    def rebuild_moves_indexes(self):
+        """Recreate the ingest-schema moves indexes after a massive delete.
+
+        Only the persistent indexes come back; the pruning-only helpers
+        stay dropped since cleanup_pruning_indexes would remove them
+        anyway."""
+        self.conn.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS main_tree.idx_moves_triple
+            ON moves(from_position_id, to_position_id, move)
+        """)
+        self.conn.execute("""
+            CREATE INDEX IF NOT EXISTS main_tree.idx_moves_from_position
+            ON moves(from_position_id)
+        """)
 
     def cleanup_pruning_indexes(self):
         """Drop temporary indexes created for pruning operations."""
         self.conn.execute("DROP INDEX IF EXISTS main_tree.idx_moves_stats_join")
+        self.conn.execute("DROP INDEX IF EXISTS main_tree.idx_ps_core")
+        self.conn.execute("DROP INDEX IF EXISTS main_tree.idx_moves_from_to")
+        self.conn.execute("DROP INDEX IF EXISTS main_tree.idx_moves_to")
 
     def vacuum_database(self):
-        """Vacuum the main database to reclaim space."""
-        self.conn.execute("VACUUM main_tree")
+        """Reclaim freed space in the main database.
+
+        Trees built with auto_vacuum=INCREMENTAL hand back their freed
+        pages in O(freed) work; older trees without it fall back to a
+        full VACUUM, which rewrites the entire file."""
+        auto_vacuum = self.conn.execute("PRAGMA main_tree.auto_vacuum").fetchone()[0]
+        if auto_vacuum == 2:
+            self.conn.execute("PRAGMA main_tree.incremental_vacuum")
+        else:
+            self.conn.execute("VACUUM main_tree")
+
+    def optimize_main_tree(self):
+        """Refresh the main tree's planner statistics after pruning.
+
+        A big delete leaves sqlite_stat1 describing a tree that no longer
+        exists, so later imports and prunes would plan against stale row
+        counts. PRAGMA optimize re-analyses only the tables that changed
+        enough to matter, and the analysis_limit bounds its cost per
+        table."""
+        self.conn.execute("PRAGMA analysis_limit=1000")
+        self.conn.execute("PRAGMA main_tree.optimize")
 
     @contextmanager
     def transaction(self):
-        """Context manager for transactions."""
+        """Context manager for transactions.
+
+        Every caller writes, so the write lock is taken up front with
+        BEGIN IMMEDIATE instead of risking SQLITE_BUSY on the upgrade
+        from a deferred read transaction."""
+        self.conn.execute("BEGIN IMMEDIATE")
         try:
             yield self.conn
             self.conn.commit()
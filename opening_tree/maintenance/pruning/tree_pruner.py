@@ -18,44 +18,66 @@ class TreePruner:
     def prune_single_game_positions(self,
                                    max_distance: int = 5,
                                    batch_size: int = 1000,
-                                   progress_callback: Optional[Callable[[str, int], None]] = None):
-        conn = sqlite3.connect(self.workspace_tree_path)
+                                   progress_callback: Optional[Callable[[str, int], None]] = None,
+                                   rebuild_indexes_threshold: float = 0.3):
+        # A larger statement cache keeps every prepared statement of the
+        # prune resident; the delete SQL itself is constant (batches join
+        # the del_ids staging table instead of interpolating placeholders)
+        conn = sqlite3.connect(self.workspace_tree_path, cached_statements=256)
         try:
             # Create repository and attach main database
             repository = PruningRepository(conn)
             repository.attach_main_database(self.main_tree_path)
+            repository.ensure_main_tree_indexes()
 
             # Create workspace schema
             repository.create_schema()
 
             # Initialize workspace with single-game positions
             workspace = PruningWorkspace(repository)
-            workspace.initialise_closeness()
+            # Each stage reports the change count its own statement
+            # produced, so progress costs no extra COUNT(*) scans
+            count = workspace.initialise_closeness()
             if progress_callback:
-                count = self._count_positions(repository)
                 progress_callback("Initialized workspace", count)
 
             # Calculate closeness to core positions
             analyser = GraphAnalyser(repository)
-            analyser.calculate_closeness(max_distance, batch_size, progress_callback)
+            count = analyser.calculate_closeness(max_distance, batch_size, progress_callback)
             if progress_callback:
-                count = self._count_marked_positions(repository)
                 progress_callback("Calculated position closeness", count)
 
-            # Mark positions for deletion
-            workspace.mark_positions_for_deletion(max_distance)
+            # When most of the tree is going away, dropping the moves
+            # indexes for the duration of the delete and rebuilding them
+            # afterwards beats per-row B-tree maintenance; small deletes
+            # keep the indexes since a rebuild would cost more
+            analysed, reachable, _ = repository.get_stats()
+            doomed = analysed - reachable
+            total_positions = repository.count_tree_positions()
+            indexes_dropped = (
+                total_positions > 0
+                and doomed / total_positions > rebuild_indexes_threshold
+            )
+            if indexes_dropped:
+                repository.drop_moves_indexes()
+
+            # Delete all unreachable positions in one pass; the doomed
+            # set is read straight from position_closeness, so no
+            # separate marking stage is needed
+            total_deleted = repository.delete_all_tree_positions()
             if progress_callback:
-                count = self._count_positions_to_delete(repository)
-                progress_callback("Marked positions for deletion", count)
+                progress_callback("Deleting positions", total_deleted)
 
-            # Delete positions in batches
-            total_deleted = self._execute_batch_deletion(repository, batch_size, progress_callback)
+            if indexes_dropped:
+                repository.rebuild_moves_indexes()
 
             # Clean up temporary pruning indexes
             repository.cleanup_pruning_indexes()
 
-            # Vacuum the database to reclaim space
+            # Vacuum the database to reclaim space, then refresh planner
+            # statistics so post-prune queries see the shrunken tree
             repository.vacuum_database()
+            repository.optimize_main_tree()
 
             if progress_callback:
                 progress_callback("Completed pruning", total_deleted)
@@ -65,43 +87,3 @@ class TreePruner:
                 repository.detach_main_database()
                 conn.close()
 
-    def _count_positions(self, repository: PruningRepository) -> int:
-        """Count total positions being analyzed."""
-        return repository.count_positions()
-
-    def _count_marked_positions(self, repository: PruningRepository) -> int:
-        """Count positions that have been processed."""
-        return repository.count_marked_positions()
-
-    def _count_positions_to_delete(self, repository: PruningRepository) -> int:
-        """Count positions marked for deletion."""
-        return repository.count_positions_to_delete()
-
-    def _execute_batch_deletion(self,
-                               repository: PruningRepository,
-                               batch_size: int,
-                               progress_callback: Optional[Callable[[str, int], None]] = None) -> int:
-        """Execute the deletion of marked positions in batches, starting with leaf nodes.
-
-        Returns:
-            Total number of positions deleted
-        """
-        total_deleted = 0
-
-        while True:
-            # Try to get leaf positions first
-            positions = repository.get_leaf_positions_for_deletion(batch_size)
-            if not positions:
-                # If no leaf positions left, get any remaining positions
-                positions = repository.get_positions_for_deletion(batch_size)
-                if not positions:
-                    break
-
-            repository.delete_positions(positions)
-            batch_count = len(positions)
-            total_deleted += batch_count
-
-            if progress_callback:
-                progress_callback("Deleting positions", total_deleted)
-
-        return total_deleted
\ No newline at end of file
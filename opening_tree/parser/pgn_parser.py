@@ -1,43 +1,100 @@
 from typing import Iterator, Tuple
+import sys
+import chess
 import chess.pgn
 from pathlib import Path
 
+def _fen_fields(board: chess.Board) -> str:
+    """Build the first four FEN segments straight from the board state.
+
+    Skips the halfmove/fullmove counters (the tree never stores them) and
+    the full board.fen() serialization. The en-passant square is emitted
+    only when a pawn of the side to move stands ready to capture onto it
+    (one bitboard AND), so the output already matches what normalise_fen
+    would produce and the slow validation path never runs during imports.
+    """
+    ep = '-'
+    if board.ep_square is not None:
+        capturers = (chess.BB_PAWN_ATTACKS[not board.turn][board.ep_square]
+                     & board.pawns & board.occupied_co[board.turn])
+        if capturers:
+            ep = chess.square_name(board.ep_square)
+    turn = 'w' if board.turn else 'b'
+    return f"{board.board_fen()} {turn} {board.castling_xfen()} {ep}"
+
 class PGNParser:
     @staticmethod
-    def parse_file(pgn_path: Path) -> Iterator[chess.pgn.Game]:
+    def parse_file(pgn_path: Path, min_rating: int = 0) -> Iterator[chess.pgn.Game]:
         """Parse a PGN file and yield each game.
 
         Skips games that use chess variants (e.g., Chess960) by checking the 'Variant' header.
-        Only standard chess games are processed.
+        Only standard chess games are processed. When min_rating is set,
+        games with either player below it are rejected from the headers
+        alone, before their movetext is ever tokenized — on filtered
+        corpora most games never reach the full parser.
         """
         game_count = 0
         with open(pgn_path, encoding='iso-8859-1') as pgn_file:
             while True:
+                # Read headers first: for variant games this skips the
+                # movetext without tokenizing it, and for standard games
+                # the file is rewound and parsed in full
+                offset = pgn_file.tell()
+                headers = chess.pgn.read_headers(pgn_file)
+                if headers is None:
+                    break
+
+                game_count += 1
+                # One stdout write per 1024 games; a per-game print is a
+                # syscall per game over a million-game import
+                if game_count & 0x3FF == 0:
+                    sys.stdout.write(f"\rGame: {game_count}")
+                    sys.stdout.flush()
+
+                # Skip games that use chess variants
+                if 'Variant' in headers:
+                    continue
+
+                # Skip games below the rating floor; missing or malformed
+                # Elo headers count as unrated, matching the service-side
+                # filter
+                if min_rating:
+                    try:
+                        white_elo = int(headers.get('WhiteElo') or 0)
+                        black_elo = int(headers.get('BlackElo') or 0)
+                    except ValueError:
+                        continue
+                    if white_elo < min_rating or black_elo < min_rating:
+                        continue
+
+                pgn_file.seek(offset)
                 try:
                     game = chess.pgn.read_game(pgn_file)
                 except Exception as e:
                     print(f"Error reading game: {e}")
+                    continue
 
                 if game is None:
                     break
 
-                game_count += 1
-                print(f"Game: {game_count}", end='\r')
-
-                # Skip games that use chess variants
-                if 'Variant' in game.headers:
-                    continue
-
                 game.headers['GameNo'] = str(game_count)
 
                 yield game
 
     @staticmethod
-    def extract_moves(game: chess.pgn.Game) -> Iterator[Tuple[str, str]]:
-        """Extract moves from a game, yielding (position_fen, move_san) pairs."""
+    def extract_moves(game: chess.pgn.Game) -> Iterator[Tuple[str, str, str]]:
+        """Extract moves from a game, yielding (from_fen, to_fen, move_san).
+
+        The board is carried across moves, so each position is serialized
+        exactly once rather than rebuilt from a FEN string per move. Moves
+        come from the mainline python-chess already decoded while reading
+        the PGN; san_and_push renders the SAN and advances the board in a
+        single pass instead of separate san() and push() calls.
+        """
         board = game.board()
+        from_fen = _fen_fields(board)
         for move in game.mainline_moves():
-            position_fen = board.fen(en_passant='fen')
-            move_san = board.san(move)
-            board.push(move)
-            yield position_fen, move_san
\ No newline at end of file
+            move_san = board.san_and_push(move)
+            to_fen = _fen_fields(board)
+            yield from_fen, to_fen, move_san
+            from_fen = to_fen
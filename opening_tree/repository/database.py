@@ -1,25 +1,238 @@
+from collections import OrderedDict
 from typing import Dict, Any, List
+import hashlib
 import sqlite3
+import threading
+
+
+def fen_hash(fen: str) -> bytes:
+    """Hash a FEN into the fixed 16-byte key the positions table indexes.
+
+    blake2b at 128 bits keeps the UNIQUE index a quarter of the size of
+    the ~60-byte FEN text; collisions are astronomically unlikely.
+    """
+    return hashlib.blake2b(fen.encode(), digest_size=16).digest()
+
+
+def pack_date(iso_date: str) -> int:
+    """Pack an ISO date ('YYYY', 'YYYY-MM' or 'YYYY-MM-DD') into YYYYMMDD.
+
+    Storing the date as an integer makes the UPSERT's MAX() an integer
+    compare instead of a string one. Unknown dates pack to 0.
+    """
+    if not iso_date:
+        return 0
+    parts = iso_date.split('-')
+    packed = int(parts[0]) * 10000
+    if len(parts) > 1:
+        packed += int(parts[1]) * 100
+    if len(parts) > 2:
+        packed += int(parts[2])
+    return packed
+
+
+def unpack_date(packed: int) -> str:
+    """Expand a packed YYYYMMDD integer back to its ISO text form."""
+    if not packed:
+        return ''
+    year, month_day = divmod(packed, 10000)
+    month, day = divmod(month_day, 100)
+    if day:
+        return f"{year:04d}-{month:02d}-{day:02d}"
+    if month:
+        return f"{year:04d}-{month:02d}"
+    return f"{year:04d}"
+
+
+# Game result -> (white_wins, black_wins, draws) contribution, looked up
+# once per game instead of three string compares per position
+_RESULT_MAP = {'1-0': (1, 0, 0), '0-1': (0, 1, 0), '1/2-1/2': (0, 0, 1)}
+_RESULT_DEFAULT = (0, 0, 0)
+
+
+# Hot-path SQL as module constants so every call passes the same string
+# object and is guaranteed a prepared-statement cache hit
+_SQL_SELECT_POSITION_ID = "SELECT id FROM positions WHERE fen_hash = ?"
+
+_SQL_UPSERT_POSITION = (
+    "INSERT INTO positions (fen_hash, fen) VALUES (?, ?) "
+    "ON CONFLICT(fen_hash) DO UPDATE SET fen = excluded.fen "
+    "RETURNING id"
+)
+
+_SQL_INSERT_MOVE = (
+    "INSERT OR IGNORE INTO moves (from_position_id, to_position_id, move) VALUES (?, ?, ?)"
+)
+
+# Rows per multi-row VALUES insert when flushing moves (3 bound
+# parameters per row; keeps well under SQLite's 32766 variable limit)
+_MOVES_CHUNK = 500
+
+_SQL_INSERT_MOVES_CHUNK = (
+    "INSERT OR IGNORE INTO moves (from_position_id, to_position_id, move) VALUES "
+    + ",".join(["(?, ?, ?)"] * _MOVES_CHUNK)
+)
+
+_SQL_UPSERT_STATS = """
+    INSERT INTO position_statistics (
+        position_id, total_games, white_wins, black_wins, draws,
+        total_player_elo, total_player_performance, last_played_date, game_ref
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(position_id) DO UPDATE SET
+        total_games = total_games + excluded.total_games,
+        white_wins = white_wins + excluded.white_wins,
+        black_wins = black_wins + excluded.black_wins,
+        draws = draws + excluded.draws,
+        total_player_elo = total_player_elo + excluded.total_player_elo,
+        total_player_performance = total_player_performance + excluded.total_player_performance,
+        last_played_date = MAX(last_played_date, excluded.last_played_date),
+        game_ref = CASE
+            WHEN excluded.last_played_date > last_played_date THEN excluded.game_ref
+            ELSE game_ref
+        END
+"""
 
 class OpeningTreeRepository:
+    # Maximum number of FEN -> position id mappings kept in memory
+    FEN_CACHE_SIZE = 500_000
+
     def __init__(self, tree_path: str, read_only: bool = False):
         self.tree_path = tree_path
+        self.read_only = read_only
+        self._in_bulk = False
+        self._fen_cache: OrderedDict[str, int] = OrderedDict()
+        # Pending writes, merged in memory until the next flush so hot
+        # positions (e.g. the start position) produce one UPSERT per
+        # batch rather than one per game
+        self._pending_moves: set = set()
+        self._stats_accum: Dict[int, list] = {}
         if read_only:
-            self.conn = sqlite3.connect(f"file:{tree_path}?mode=ro&immutable=1", uri=True)
-            self.conn.execute("PRAGMA query_only=1")
+            # Read-only connections are opened lazily, one per thread (see
+            # the conn property), so the threaded server's handlers don't
+            # serialize on a single connection mutex
+            self._local = threading.local()
         else:
-            self.conn = sqlite3.connect(tree_path)
+            # check_same_thread=False lets a dedicated writer thread share
+            # the connection during imports (access is serialized by the
+            # producer/consumer queue, never concurrent).
+            # isolation_level=None disables sqlite3's implicit transaction
+            # tracking — the repository issues BEGIN/COMMIT explicitly.
+            self._conn = sqlite3.connect(
+                tree_path, cached_statements=256, check_same_thread=False,
+                isolation_level=None
+            )
             self._configure_sqlite_performance()
             self._init_database()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """The connection for the current thread.
+
+        Writers share one long-lived connection; read-only repositories
+        open a tuned connection per thread on first use.
+        """
+        if not self.read_only:
+            return self._conn
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._open_read_only()
+            self._local.conn = conn
+        return conn
+
+    def _open_read_only(self) -> sqlite3.Connection:
+        """Open an immutable read-only connection tuned for queries."""
+        conn = sqlite3.connect(
+            f"file:{self.tree_path}?mode=ro&immutable=1", uri=True,
+            cached_statements=256
+        )
+        conn.execute("PRAGMA query_only=1")
+        conn.execute("PRAGMA cache_size=-131072")
+        conn.execute("PRAGMA mmap_size=268435456")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    def close(self) -> None:
+        """Close the underlying connection when the repository is done."""
+        self.conn.close()
+
+    def begin_bulk(self) -> None:
+        """Start a bulk import spanning many games in a single transaction.
+
+        While in bulk mode, add_game_to_opening_tree skips its per-game
+        BEGIN/COMMIT so the cost of an fsync is paid once per batch rather
+        than once per game. The moves uniqueness index is dropped for the
+        duration of the load and rebuilt in end_bulk; the in-memory move
+        set keeps batches duplicate-free in the meantime.
+        """
+        self._in_bulk = True
+        # A crash mid-import loses work that would be re-imported anyway,
+        # so skip the WAL fsyncs for the duration of the load; end_bulk
+        # restores durable syncs before the import is recorded
+        self.conn.execute("PRAGMA synchronous=OFF")
+        self.disable_indexes()
+        self.conn.execute("BEGIN IMMEDIATE")
+
+    def commit_bulk(self) -> None:
+        """Flush accumulated writes, commit the batch and open the next one."""
+        self._flush_pending()
+        self.conn.commit()
+        self.conn.execute("BEGIN IMMEDIATE")
+
+    def end_bulk(self) -> None:
+        """Flush and commit any outstanding bulk work and leave bulk mode."""
+        self._flush_pending()
+        self.conn.commit()
+        self.rebuild_indexes()
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        # Refresh planner statistics now that the tables and the rebuilt
+        # index reflect the imported data; the limit bounds the scan cost
+        self.conn.execute("PRAGMA analysis_limit=1000")
+        self.conn.execute("PRAGMA optimize")
+        self._in_bulk = False
+
+    def disable_indexes(self) -> None:
+        """Drop the moves uniqueness index ahead of a bulk load."""
+        self.conn.execute("DROP INDEX IF EXISTS idx_moves_triple")
+
+    def rebuild_indexes(self) -> None:
+        """Recreate the moves uniqueness index after a bulk load.
+
+        Duplicate rows can slip in while the index is down (the in-memory
+        move set is cleared at each batch flush), so collapse them first
+        or the UNIQUE rebuild would fail.
+        """
+        self.conn.execute("""
+            DELETE FROM moves WHERE id NOT IN (
+                SELECT MIN(id) FROM moves
+                GROUP BY from_position_id, to_position_id, move
+            )
+        """)
+        self.conn.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_moves_triple
+            ON moves(from_position_id, to_position_id, move)
+        """)
+        self.conn.commit()
     
     def _configure_sqlite_performance(self) -> None:
         """Configure SQLite for optimal performance."""
+        # Use larger pages for the B-tree indexes; only takes effect on a
+        # fresh database (must run before any table is created)
+        self.conn.execute("PRAGMA page_size=8192")
+
+        # Track freed pages so pruning can reclaim them incrementally
+        # instead of rewriting the whole file with VACUUM; like
+        # page_size, only takes effect on a fresh database
+        self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+
         # Enable WAL mode for better concurrency
         self.conn.execute("PRAGMA journal_mode=WAL")
-        
-        # Increase cache size (default is 2MB, set to 64MB)
-        self.conn.execute("PRAGMA cache_size=-65536")
-        
+
+        # Increase cache size (default is 2MB, set to 256MB)
+        self.conn.execute("PRAGMA cache_size=-262144")
+
+        # Memory-map the database file to avoid read() syscalls (256MB)
+        self.conn.execute("PRAGMA mmap_size=268435456")
+
         # Use memory for temporary tables
         self.conn.execute("PRAGMA temp_store=MEMORY")
         
@@ -28,6 +241,11 @@ class OpeningTreeRepository:
         
         # Set busy timeout to handle concurrent access
         self.conn.execute("PRAGMA busy_timeout=30000")
+
+        # Checkpoint the WAL less often during sustained writes (default
+        # is every 1000 pages); bulk imports amortize the checkpoint cost
+        # over ten times as many pages
+        self.conn.execute("PRAGMA wal_autocheckpoint=10000")
         
         # Enable query planner optimizations
         self.conn.execute("PRAGMA optimize")
@@ -40,7 +258,8 @@ class OpeningTreeRepository:
         self.conn.executescript("""
             CREATE TABLE IF NOT EXISTS positions (
                 id INTEGER PRIMARY KEY,
-                fen TEXT UNIQUE NOT NULL
+                fen_hash BLOB UNIQUE NOT NULL,
+                fen TEXT NOT NULL
             );
 
             CREATE TABLE IF NOT EXISTS moves (
@@ -49,10 +268,14 @@ class OpeningTreeRepository:
                 to_position_id INTEGER NOT NULL,
                 move TEXT NOT NULL,
                 FOREIGN KEY (from_position_id) REFERENCES positions (id),
-                FOREIGN KEY (to_position_id) REFERENCES positions (id),
-                UNIQUE(from_position_id, to_position_id, move)
+                FOREIGN KEY (to_position_id) REFERENCES positions (id)
             );
 
+            -- Named (rather than inline UNIQUE) so bulk imports can drop
+            -- and rebuild it around the load
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_moves_triple
+            ON moves(from_position_id, to_position_id, move);
+
             CREATE TABLE IF NOT EXISTS position_statistics (
                 position_id INTEGER PRIMARY KEY,
                 total_games INTEGER NOT NULL DEFAULT 0,
@@ -61,7 +284,7 @@ class OpeningTreeRepository:
                 draws INTEGER NOT NULL DEFAULT 0,
                 total_player_elo INTEGER NOT NULL DEFAULT 0,
                 total_player_performance INTEGER NOT NULL DEFAULT 0,
-                last_played_date TEXT NOT NULL DEFAULT '',
+                last_played_date INTEGER NOT NULL DEFAULT 0,
                 game_ref TEXT NOT NULL DEFAULT '',
                 FOREIGN KEY (position_id) REFERENCES positions (id)
             );
@@ -81,50 +304,51 @@ class OpeningTreeRepository:
             -- Performance indexes for large databases
             CREATE INDEX IF NOT EXISTS idx_moves_from_position ON moves(from_position_id);
 
+            -- Covering index for the stat-based import dedup fast path
+            CREATE INDEX IF NOT EXISTS idx_imported_name_stat
+            ON imported_pgn_files(filename, file_size, last_modified);
+
             -- Analyze tables for query optimization
             ANALYZE;
         """)
 
     def add_position(self, fen: str) -> int:
-        """Add a position to the database and return its ID."""
-        cursor = self.conn.execute(
-            "INSERT OR IGNORE INTO positions (fen) VALUES (?)",
-            (fen,)
-        )
-        if cursor.rowcount == 0:  # Position already exists
-            return self.conn.execute(
-                "SELECT id FROM positions WHERE fen = ?",
-                (fen,)
+        """Add a position to the database and return its ID.
+
+        Results are cached in an LRU dict, so repeat positions (the
+        opening moves of almost every game) cost no SQL at all. On a
+        cache miss a read-only SELECT is tried first — on a warmed tree
+        most positions already exist and a SELECT avoids dirtying the
+        row the way an UPSERT would — and only a genuinely new position
+        pays for the INSERT with RETURNING.
+        """
+        cache = self._fen_cache
+        position_id = cache.get(fen)
+        if position_id is not None:
+            cache.move_to_end(fen)
+            return position_id
+
+        key = fen_hash(fen)
+        row = self.conn.execute(_SQL_SELECT_POSITION_ID, (key,)).fetchone()
+        if row is not None:
+            position_id = row[0]
+        else:
+            position_id = self.conn.execute(
+                _SQL_UPSERT_POSITION, (key, fen)
             ).fetchone()[0]
-        return cursor.lastrowid
+
+        cache[fen] = position_id
+        if len(cache) > self.FEN_CACHE_SIZE:
+            cache.popitem(last=False)
+        return position_id
 
     def add_move(self, from_pos_id: int, to_pos_id: int, move: str) -> None:
         """Add a move between two positions."""
-        self.conn.execute(
-            "INSERT OR IGNORE INTO moves (from_position_id, to_position_id, move) VALUES (?, ?, ?)",
-            (from_pos_id, to_pos_id, move)
-        )
+        self.conn.execute(_SQL_INSERT_MOVE, (from_pos_id, to_pos_id, move))
 
     def update_statistics(self, position_id: int, new_stats: Dict[str, Any]) -> None:
         """Update statistics for a position, merging with existing stats if present."""
-        self.conn.execute("""
-            INSERT INTO position_statistics (
-                position_id, total_games, white_wins, black_wins, draws,
-                total_player_elo, total_player_performance, last_played_date, game_ref
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ON CONFLICT(position_id) DO UPDATE SET
-                total_games = total_games + excluded.total_games,
-                white_wins = white_wins + excluded.white_wins,
-                black_wins = black_wins + excluded.black_wins,
-                draws = draws + excluded.draws,
-                total_player_elo = total_player_elo + excluded.total_player_elo,
-                total_player_performance = total_player_performance + excluded.total_player_performance,
-                last_played_date = MAX(last_played_date, excluded.last_played_date),
-                game_ref = CASE
-                    WHEN excluded.last_played_date > last_played_date THEN excluded.game_ref
-                    ELSE game_ref
-                END
-        """, (
+        self.conn.execute(_SQL_UPSERT_STATS, (
             position_id,
             new_stats['total_games'],
             new_stats['white_wins'],
@@ -132,12 +356,18 @@ class OpeningTreeRepository:
             new_stats['draws'],
             new_stats['total_player_elo'],
             new_stats['total_player_performance'],
-            new_stats['last_played_date'],
+            pack_date(new_stats['last_played_date']),
             new_stats['game_ref']
         ))
 
-    def _update_position_stats(self, position_id: int, game_data: 'GameData', is_white_to_move: bool) -> None:
-        """Update statistics for a position based on game data."""
+    def _position_stats(self, game_data: 'GameData', is_white_to_move: bool,
+                        result_counts: tuple, packed_date: int) -> tuple:
+        """Build the statistics contribution of one game at one position.
+
+        Returns a tuple in position_statistics column order (minus the
+        leading position_id); positional binding avoids a dict allocation
+        and eight hash lookups per move.
+        """
         # If white is to move, black just moved, and vice versa
         just_moved_is_white = not is_white_to_move
 
@@ -149,59 +379,154 @@ class OpeningTreeRepository:
             player_elo = game_data.black_elo
             player_performance = game_data.black_performance
 
-        stats = {
-            'total_games': 1,
-            'white_wins': 1 if game_data.result == '1-0' else 0,
-            'black_wins': 1 if game_data.result == '0-1' else 0,
-            'draws': 1 if game_data.result == '1/2-1/2' else 0,
-            'total_player_elo': player_elo,
-            'total_player_performance': player_performance,
-            'last_played_date': game_data.date,
-            'game_ref': game_data.game_ref
-        }
-        self.update_statistics(position_id, stats)
+        white_wins, black_wins, draws = result_counts
+        return (
+            1,  # total_games
+            white_wins,
+            black_wins,
+            draws,
+            player_elo,
+            player_performance,
+            packed_date,
+            game_data.game_ref
+        )
 
     def add_game_to_opening_tree(self, game_data: 'GameData') -> None:
-        """Add a complete game to the opening tree within a single transaction."""
+        """Add a complete game to the opening tree.
+
+        Outside bulk mode each game gets its own transaction; in bulk mode
+        the caller owns the transaction boundary (see begin_bulk).
+        """
+        if self._in_bulk:
+            self._add_game(game_data)
+            return
+
         self.conn.execute("BEGIN TRANSACTION")
         try:
-            # Process each move
-            for move in game_data.moves:
-                # Add positions
+            self._add_game(game_data)
+            self._flush_pending()
+            self.conn.commit()
+        except Exception as e:
+            self.conn.rollback()
+            raise e
+
+    def _add_game(self, game_data: 'GameData') -> None:
+        """Accumulate a game's positions, moves and statistics in memory.
+
+        Moves are deduplicated in a set and statistics merged per position
+        id, so a batch of games produces one row per distinct move and
+        position when flushed, instead of one UPSERT per game visit.
+        """
+        # Process each move; consecutive moves chain (move N's to_position
+        # is move N+1's from_position), so reuse the previous id directly
+        prev_fen = None
+        prev_id = None
+        result_counts = _RESULT_MAP.get(game_data.result, _RESULT_DEFAULT)
+        packed_date = pack_date(game_data.date)
+        for move in game_data.moves:
+            # Add positions
+            if move.from_position == prev_fen:
+                from_pos_id = prev_id
+            else:
                 from_pos_id = self.add_position(move.from_position)
-                to_pos_id = self.add_position(move.to_position)
+            to_pos_id = self.add_position(move.to_position)
+            prev_fen = move.to_position
+            prev_id = to_pos_id
 
-                # Add move
-                self.add_move(from_pos_id, to_pos_id, move.move_san)
+            self._pending_moves.add((from_pos_id, to_pos_id, move.move_san))
 
-                # Get who is to move from the FEN (2nd segment)
-                is_white_to_move = move.from_position.split()[1] == 'w'
+            # Statistics for the starting position; the side to move was
+            # computed once at parse time and carried on the move tuple
+            self._accumulate_stats(from_pos_id, game_data, move.is_white_to_move,
+                                   result_counts, packed_date)
 
-                # Update statistics for the starting position
-                self._update_position_stats(from_pos_id, game_data, is_white_to_move)
+        # Statistics for the final position if there were any moves; the
+        # side to move flips after the last move
+        if game_data.moves:
+            self._accumulate_stats(to_pos_id, game_data, not move.is_white_to_move,
+                                   result_counts, packed_date)
 
-            # Update statistics for the final position if there were any moves
-            if game_data.moves:
-                is_white_to_move = move.to_position.split()[1] == 'w'
-                self._update_position_stats(to_pos_id, game_data, is_white_to_move)
+    def _accumulate_stats(self, position_id: int, game_data: 'GameData',
+                          is_white_to_move: bool, result_counts: tuple,
+                          packed_date: int) -> None:
+        """Merge one game's statistics contribution into the in-memory batch."""
+        stats = self._position_stats(game_data, is_white_to_move, result_counts, packed_date)
+        row = self._stats_accum.get(position_id)
+        if row is None:
+            self._stats_accum[position_id] = list(stats)
+        else:
+            row[0] += stats[0]
+            row[1] += stats[1]
+            row[2] += stats[2]
+            row[3] += stats[3]
+            row[4] += stats[4]
+            row[5] += stats[5]
+            if stats[6] > row[6]:
+                row[6] = stats[6]
+                row[7] = stats[7]
 
-            self.conn.commit()
-        except Exception as e:
-            self.conn.rollback()
-            raise e
+    def _flush_pending(self) -> None:
+        """Write the accumulated move and statistics batches to the database."""
+        if self._pending_moves:
+            # Insert moves in multi-row VALUES chunks: one statement
+            # execution per _MOVES_CHUNK rows instead of one per row
+            rows = list(self._pending_moves)
+            self._pending_moves.clear()
+            full = len(rows) // _MOVES_CHUNK * _MOVES_CHUNK
+            for start in range(0, full, _MOVES_CHUNK):
+                params = [value for row in rows[start:start + _MOVES_CHUNK] for value in row]
+                self.conn.execute(_SQL_INSERT_MOVES_CHUNK, params)
+            if full < len(rows):
+                self.conn.executemany(_SQL_INSERT_MOVE, rows[full:])
+
+        if self._stats_accum:
+            # Flush in position_id order so the UPSERTs walk the
+            # statistics B-tree sequentially, touching each leaf page
+            # once instead of revisiting pages in insertion order
+            self.conn.executemany(
+                _SQL_UPSERT_STATS,
+                [(position_id, *row) for position_id, row in sorted(self._stats_accum.items())]
+            )
+            self._stats_accum.clear()
 
     def add_imported_pgn_file(self, filename: str, name: str, last_modified: str, file_size: int, file_hash: str, total_games: int) -> None:
-        """Record a successfully imported PGN file."""
-        self.conn.execute("BEGIN TRANSACTION")
-        try:
-            self.conn.execute("""
-                INSERT INTO imported_pgn_files (filename, name, last_modified, file_size, file_hash, total_games)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (filename, name, last_modified, file_size, file_hash, total_games))
-            self.conn.commit()
-        except Exception as e:
-            self.conn.rollback()
-            raise e
+        """Record a successfully imported PGN file.
+
+        A single statement is its own transaction under autocommit, so no
+        explicit BEGIN/COMMIT is needed; re-importing the same file just
+        refreshes its import date instead of raising a unique violation.
+        """
+        self.conn.execute("""
+            INSERT INTO imported_pgn_files (filename, name, last_modified, file_size, file_hash, total_games)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(filename, file_hash)
+            DO UPDATE SET import_date = CURRENT_TIMESTAMP
+        """, (filename, name, last_modified, file_size, file_hash, total_games))
+
+    def get_imported_pgn_file_by_stat(self, filename: str, file_size: int,
+                                      last_modified: str) -> Dict[str, Any] | None:
+        """Check for a prior import of a file by its stat signature.
+
+        A matching (filename, size, mtime) means the file is unchanged
+        since it was imported, letting callers skip hashing it. Returns
+        the import record if found, None otherwise.
+        """
+        cursor = self.conn.execute(
+            "SELECT filename, last_modified, file_size, file_hash, import_date "
+            "FROM imported_pgn_files "
+            "WHERE filename = ? AND file_size = ? AND last_modified = ?",
+            (filename, file_size, last_modified)
+        )
+        row = cursor.fetchone()
+        if row:
+            return {
+                'filename': row[0],
+                'last_modified': row[1],
+                'file_size': row[2],
+                'file_hash': row[3],
+                'import_date': row[4]
+            }
+        return None
 
     def get_imported_pgn_file(self, filename: str, file_hash: str) -> Dict[str, Any] | None:
         """Check if a PGN file has already been imported.
@@ -233,7 +558,7 @@ class OpeningTreeRepository:
             Position data if found, None otherwise.
         """
         cursor = self.conn.execute(
-            "SELECT id, fen FROM positions WHERE fen = ?", (fen,)
+            "SELECT id, fen FROM positions WHERE fen_hash = ?", (fen_hash(fen),)
         )
         row = cursor.fetchone()
         if row:
@@ -250,7 +575,9 @@ class OpeningTreeRepository:
             position_id: ID of the position to get moves from.
 
         Returns:
-            List of moves with their statistics.
+            List of moves with their statistics, ordered by popularity.
+            The rating and performance averages are computed in SQL so no
+            per-row arithmetic is left for the query path.
         """
         cursor = self.conn.execute("""
             SELECT
@@ -260,8 +587,8 @@ class OpeningTreeRepository:
                 s.white_wins,
                 s.draws,
                 s.black_wins,
-                s.total_player_elo,
-                s.total_player_performance,
+                s.total_player_elo / s.total_games,
+                s.total_player_performance / s.total_games,
                 s.last_played_date,
                 s.game_ref
             FROM moves m
@@ -278,8 +605,8 @@ class OpeningTreeRepository:
             "white_wins": row[3],
             "draws": row[4],
             "black_wins": row[5],
-            "total_player_elo": row[6],
-            "total_player_performance": row[7],
-            "last_played_date": row[8],
+            "rating": row[6],
+            "performance": row[7],
+            "last_played_date": unpack_date(row[8]),
             "game_ref": row[9]
-        } for row in cursor.fetchall()]
+        } for row in cursor]
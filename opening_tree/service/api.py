@@ -6,6 +6,27 @@ from pathlib import Path
 from opening_tree.repository.database import OpeningTreeRepository
 from opening_tree.service.opening_tree import OpeningTreeService
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dump_json(obj, pretty: bool = False) -> bytes:
+    """Serialize a response body to JSON bytes.
+
+    Uses orjson (Rust, ~5x faster, returns bytes directly) when installed,
+    falling back to the stdlib encoder otherwise. Output is compact by
+    default — indentation is for humans, so only the CLI asks for it.
+    """
+    if orjson is not None:
+        if pretty:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+        return orjson.dumps(obj)
+    if pretty:
+        return json.dumps(obj, indent=2).encode()
+    return json.dumps(obj, separators=(',', ':')).encode()
+
 
 class OpeningTreeAPI:
     """Core API logic for opening tree queries, usable by both HTTP server and WSGI."""
@@ -14,11 +35,18 @@ class OpeningTreeAPI:
         self.trees = trees
         self.base_url = base_url
     
-    def list_trees(self) -> Dict:
-        """Get list of available trees."""
+    def list_trees(self, base_url: Optional[str] = None) -> Dict:
+        """Get list of available trees.
+
+        An explicit base_url overrides the instance default, so callers
+        serving multiple hosts can vary the prefix per request without
+        constructing a throwaway API instance.
+        """
+        if base_url is None:
+            base_url = self.base_url
         tree_list = [{
             'name': name,
-            'path': f'{self.base_url}/{name}/' if self.base_url else f'/{name}/'
+            'path': f'{base_url}/{name}/' if base_url else f'/{name}/'
         } for name in self.trees.keys()]
         return tree_list
     
@@ -28,20 +56,45 @@ class OpeningTreeAPI:
         Returns:
             Tuple of (result_data, status_code, error_message)
         """
-        # Check if tree exists
-        if tree_name not in self.trees:
+        # One dict probe resolves the tree and its existence check
+        tree = self.trees.get(tree_name)
+        if tree is None:
             return None, 404, f"Tree '{tree_name}' not found"
-        
+
         # Decode FEN from URL
         fen = unquote(encoded_fen)
-        
+
         # Query the position
-        result = self.trees[tree_name].query_position(fen)
+        result = tree.query_position(fen)
         if not result:
             return None, 404, f"Position not found: {fen}"
-        
+
         return result, 200, ""
 
+    def query_positions(self, tree_name: str, fens: List[str]) -> Tuple[Optional[List], int, str]:
+        """Query several positions in a specific tree in one call.
+
+        Results preserve input order; positions not in the tree map to None.
+
+        Returns:
+            Tuple of (results_list, status_code, error_message)
+        """
+        tree = self.trees.get(tree_name)
+        if tree is None:
+            return None, 404, f"Tree '{tree_name}' not found"
+
+        if not isinstance(fens, list) or not all(isinstance(fen, str) for fen in fens):
+            return None, 400, "Expected a JSON array of FEN strings"
+
+        results = []
+        for fen in fens:
+            try:
+                results.append(tree.query_position(fen))
+            except ValueError:
+                # Malformed FENs map to None like unknown positions do
+                results.append(None)
+        return results, 200, ""
+
 
 def load_config(config_path: str) -> Dict:
     """Load configuration from JSON file."""
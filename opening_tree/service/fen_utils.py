@@ -1,13 +1,18 @@
-import re
+from functools import lru_cache
+
+# Digit -> run-of-spaces table for str.translate, which expands a rank
+# in one C loop instead of a Python generator per character
+_DIGIT_EXPAND = {ord(str(i)): ' ' * i for i in range(1, 9)}
 
 def _expand_fen_rank(rank_str: str) -> str:
-    joined = ''.join((' ' * int(ch)) if ch.isdigit() else ch for ch in rank_str)
-    return (joined + ' ' * 8)[:8]
+    return rank_str.translate(_DIGIT_EXPAND).ljust(8)[:8]
 
 def _normalise_en_passant(ep: str, piece_placement: str, active_color: str) -> str:
     if ep == '-':
         return ep
-    if not re.match(r'^[a-h][36]$', ep):
+    # Direct character checks: a regex match here allocates a Match
+    # object per call for what is a two-character range test
+    if len(ep) != 2 or not ('a' <= ep[0] <= 'h') or ep[1] not in '36':
         return ep
     file_idx = ord(ep[0]) - 97
     is_white_to_move = active_color == 'w'
@@ -28,10 +33,34 @@ def is_legal_enpassant(fen: str) -> bool:
         return False
     return _normalise_en_passant(ep, parts[0], parts[1]) == ep
 
+@lru_cache(maxsize=200_000)
 def normalise_fen(fen: str) -> str:
-    parts = [p for p in fen.strip().split() if p]
+    # Fast path: exactly four single-space-separated fields ending in an
+    # empty en-passant square is already canonical, so the string can be
+    # returned as-is without splitting or rebuilding. This covers the
+    # vast majority of real positions.
+    if fen.count(' ') == 3 and fen.endswith(' -') and not fen.startswith(' '):
+        return fen
+    # Second fast path: a full six-field FEN with single spaces and no
+    # en-passant square (the common query input) is sliced at the fourth
+    # space with C-level find calls, skipping the split allocation
+    a = fen.find(' ')
+    b = fen.find(' ', a + 1)
+    c = fen.find(' ', b + 1)
+    d = fen.find(' ', c + 1)
+    if a > 0 and b > a + 1 and c > b + 1 and d == c + 2 and fen[c + 1] == '-':
+        return fen[:d]
+    # split(None, 4) stops scanning after the four segments we keep and
+    # already discards surrounding/repeated whitespace
+    parts = fen.split(None, 4)
     if len(parts) < 4:
         raise ValueError(f"Invalid FEN string: insufficient parts - {fen}")
-    piece_placement, active_color, castling_rights, en_passant_target = parts[:4]
+    piece_placement = parts[0]
+    active_color = parts[1]
+    castling_rights = parts[2]
+    en_passant_target = parts[3]
+    if en_passant_target == '-':
+        # Fast path: the vast majority of positions have no en-passant square
+        return f"{piece_placement} {active_color} {castling_rights} -"
     ep = _normalise_en_passant(en_passant_target, piece_placement, active_color)
     return f"{piece_placement} {active_color} {castling_rights} {ep}"
@@ -1,7 +1,11 @@
 from pathlib import Path
-from typing import List, NamedTuple, Dict, Any
+from typing import List, NamedTuple, Dict, Any, Optional
 import chess
 import hashlib
+import multiprocessing
+import os
+import queue
+import threading
 from datetime import datetime
 
 from opening_tree.repository.database import OpeningTreeRepository
@@ -13,6 +17,7 @@ class GameMove(NamedTuple):
     from_position: str  # FEN
     to_position: str    # FEN
     move_san: str
+    is_white_to_move: bool  # side to move in from_position
 
 class GameData(NamedTuple):
     moves: List[GameMove]
@@ -31,69 +36,255 @@ class PGNFileMetadata(NamedTuple):
     file_size: int
     file_hash: str
 
+# Games per batch sent from a parse worker to the writer process; large
+# enough to amortize pickling, small enough to keep the writer fed
+_PARSE_BATCH_SIZE = 256
+
+def _parse_pgn_file_worker(pgn_path: str, pgn_name: str, max_ply: int,
+                           min_rating: int, out_queue) -> None:
+    """Parse one PGN file into GameData batches for the importing process.
+
+    Runs in a worker process: python-chess parsing is pure CPU, so each
+    file gets its own interpreter while the parent keeps sole ownership
+    of the database connection. Batches are lists; a final
+    (path, games_read, games_accepted) tuple marks completion.
+    """
+    service = OpeningTreeService(None, max_ply=max_ply, min_rating=min_rating)
+    batch: List[GameData] = []
+    games_read = 0
+    games_accepted = 0
+    for game in PGNParser.parse_file(Path(pgn_path), min_rating):
+        games_read += 1
+        try:
+            game_data = service._process_game(game, pgn_name)
+        except Exception as e:
+            print(f"Error processing game: {e}")
+            continue
+        if (game_data.white_elo < min_rating or
+            game_data.black_elo < min_rating):
+            continue
+        batch.append(game_data)
+        games_accepted += 1
+        if len(batch) >= _PARSE_BATCH_SIZE:
+            out_queue.put(batch)
+            batch = []
+    if batch:
+        out_queue.put(batch)
+    out_queue.put((pgn_path, games_read, games_accepted))
+
 class OpeningTreeService:
+    # Number of games to accumulate per bulk transaction during import
+    BULK_COMMIT_INTERVAL = 1000
+
+    # Upper bound on parsed games waiting for the writer thread
+    WRITE_QUEUE_SIZE = 256
+
     def __init__(self, repository: OpeningTreeRepository, max_ply: int = 40, min_rating: int = 0):
         self.repository = repository
         self.parser = PGNParser()
         self.max_ply = max_ply
         self.min_rating = min_rating
 
-    def _get_pgn_file_metadata(self, pgn_path: Path) -> PGNFileMetadata:
-        """Get metadata for a PGN file including size, modification time, and hash."""
-        # Get file information
-        file_stats = pgn_path.stat()
-        file_size = file_stats.st_size
-        last_modified = file_stats.st_mtime_ns
+    def _get_pgn_file_stat(self, pgn_path: Path) -> PGNFileMetadata:
+        """Get a PGN file's metadata from one stat call, without hashing.
 
-        # Calculate file hash
-        sha256_hash = hashlib.sha256()
-        with open(pgn_path, "rb") as f:
-            for byte_block in iter(lambda: f.read(4096), b""):
-                sha256_hash.update(byte_block)
-        file_hash = sha256_hash.hexdigest()
+        The file_hash field is left empty; _get_pgn_file_hash fills it
+        only when the stat signature is not enough to identify the file.
+        """
+        file_stats = pgn_path.stat()
 
         # Convert timestamp to ISO format
-        last_modified_date = datetime.fromtimestamp(last_modified / 1e9).isoformat()
-
-        # Extract name from path (filename without extension)
-        name = pgn_path.stem
+        last_modified_date = datetime.fromtimestamp(file_stats.st_mtime_ns / 1e9).isoformat()
 
         return PGNFileMetadata(
             filename=str(pgn_path),
-            name=name,
+            name=pgn_path.stem,
             last_modified=last_modified_date,
-            file_size=file_size,
-            file_hash=file_hash
+            file_size=file_stats.st_size,
+            file_hash=''
         )
 
-    def process_pgn_file(self, pgn_path: Path) -> None:
-        """Process a PGN file and add its games to the opening tree."""
-        # Get file metadata before processing
-        metadata = self._get_pgn_file_metadata(pgn_path)
+    @staticmethod
+    def _get_pgn_file_hash(pgn_path: Path) -> str:
+        """Calculate a PGN file's SHA-256 hash.
 
-        # Check if this exact file has already been imported
+        file_digest (3.11+) runs the read loop in C with a 1MB buffer
+        instead of a Python iteration per 4KB chunk.
+        """
+        with open(pgn_path, "rb") as f:
+            if hasattr(hashlib, 'file_digest'):
+                return hashlib.file_digest(f, "sha256").hexdigest()
+            sha256_hash = hashlib.sha256()
+            for byte_block in iter(lambda: f.read(1 << 20), b""):
+                sha256_hash.update(byte_block)
+            return sha256_hash.hexdigest()
+
+    def _get_pgn_file_metadata(self, pgn_path: Path) -> PGNFileMetadata:
+        """Get metadata for a PGN file including size, modification time, and hash."""
+        metadata = self._get_pgn_file_stat(pgn_path)
+        return metadata._replace(file_hash=self._get_pgn_file_hash(pgn_path))
+
+    def _metadata_if_pending(self, pgn_path: Path) -> Optional[PGNFileMetadata]:
+        """Return a file's full metadata, or None if it was already imported.
+
+        An unchanged (filename, size, mtime) signature skips the file
+        without reading it at all; only files whose stats changed pay the
+        SHA-256 pass, which then catches touched-but-identical files.
+        """
+        metadata = self._get_pgn_file_stat(pgn_path)
+        existing = self.repository.get_imported_pgn_file_by_stat(
+            metadata.filename, metadata.file_size, metadata.last_modified)
+        if existing:
+            print(f"Skipping {metadata.filename} - already imported on {existing['import_date']}")
+            return None
+
+        metadata = metadata._replace(file_hash=self._get_pgn_file_hash(pgn_path))
         existing = self.repository.get_imported_pgn_file(metadata.filename, metadata.file_hash)
         if existing:
             print(f"Skipping {metadata.filename} - already imported on {existing['import_date']}")
+            return None
+        return metadata
+
+    def process_pgn_files(self, pgn_paths: List[Path]) -> None:
+        """Import several PGN files, parsing them in parallel.
+
+        Parsing is the CPU-bound half of an import, so each pending file
+        is parsed in its own worker process and the resulting GameData
+        batches are written here over one bulk transaction, keeping
+        SQLite's single-writer model intact. Files already imported are
+        skipped up front; a single pending file takes the threaded
+        single-file path since there is nothing to parallelize.
+        """
+        pending = []
+        for pgn_path in pgn_paths:
+            metadata = self._metadata_if_pending(pgn_path)
+            if metadata is not None:
+                pending.append(metadata)
+
+        if not pending:
             return
+        if len(pending) == 1:
+            self.process_pgn_file(Path(pending[0].filename))
+            return
+
+        by_path = {metadata.filename: metadata for metadata in pending}
+        to_start = list(pending)
+        out_queue: multiprocessing.Queue = multiprocessing.Queue(
+            maxsize=self.WRITE_QUEUE_SIZE)
+        max_workers = min(len(pending), max(1, (os.cpu_count() or 2) - 1))
+        running: Dict[str, multiprocessing.Process] = {}
+
+        def start_next_worker() -> None:
+            if not to_start:
+                return
+            metadata = to_start.pop(0)
+            worker = multiprocessing.Process(
+                target=_parse_pgn_file_worker,
+                args=(metadata.filename, metadata.name, self.max_ply,
+                      self.min_rating, out_queue),
+                name='opening-tree-parser'
+            )
+            worker.start()
+            running[metadata.filename] = worker
 
-        # Process all games in the file
+        for _ in range(max_workers):
+            start_next_worker()
+
+        written = 0
+        self.repository.begin_bulk()
+        try:
+            while running:
+                item = out_queue.get()
+                if isinstance(item, tuple):
+                    # Completion marker: record the import and refill the
+                    # worker slot with the next pending file
+                    path, games_read, games_accepted = item
+                    worker = running.pop(path)
+                    worker.join()
+                    if games_accepted:
+                        metadata = by_path[path]
+                        self.repository.add_imported_pgn_file(
+                            filename=metadata.filename,
+                            name=metadata.name,
+                            last_modified=metadata.last_modified,
+                            file_size=metadata.file_size,
+                            file_hash=metadata.file_hash,
+                            total_games=games_read
+                        )
+                    start_next_worker()
+                    continue
+                for game_data in item:
+                    self.repository.add_game_to_opening_tree(game_data)
+                    written += 1
+                    if written % self.BULK_COMMIT_INTERVAL == 0:
+                        self.repository.commit_bulk()
+        finally:
+            # On error, stop outstanding parsers before closing the batch
+            for worker in running.values():
+                worker.terminate()
+            for worker in running.values():
+                worker.join()
+            self.repository.end_bulk()
+
+    def process_pgn_file(self, pgn_path: Path) -> None:
+        """Process a PGN file and add its games to the opening tree."""
+        # Get file metadata and skip files that are already imported
+        metadata = self._metadata_if_pending(pgn_path)
+        if metadata is None:
+            return
+
+        # Parse on this thread and write on a dedicated thread connected by
+        # a bounded queue, so python-chess parsing (CPU) overlaps SQLite
+        # writes (I/O; sqlite3 releases the GIL in C). The writer commits
+        # every BULK_COMMIT_INTERVAL games instead of per game.
         games_processed = False
         total_games = 0
         last_game = None
-        for game in self.parser.parse_file(pgn_path):
-            try:
-                game_data = self._process_game(game, metadata.name)
-                # Skip games where either player is below the minimum rating
-                if (game_data.white_elo < self.min_rating or
-                    game_data.black_elo < self.min_rating):
-                    continue
-                self.repository.add_game_to_opening_tree(game_data)
-                games_processed = True
-                total_games += 1
-                last_game = game
-            except Exception as e:
-                print(f"Error processing game: {e}")
+        work_queue: queue.Queue = queue.Queue(maxsize=self.WRITE_QUEUE_SIZE)
+        writer_errors: List[Exception] = []
+
+        def write_games() -> None:
+            written = 0
+            while True:
+                game_data = work_queue.get()
+                if game_data is None:
+                    break
+                if writer_errors:
+                    continue  # Keep draining so the producer never blocks
+                try:
+                    self.repository.add_game_to_opening_tree(game_data)
+                    written += 1
+                    if written % self.BULK_COMMIT_INTERVAL == 0:
+                        self.repository.commit_bulk()
+                except Exception as e:
+                    writer_errors.append(e)
+
+        self.repository.begin_bulk()
+        writer = threading.Thread(target=write_games, name='opening-tree-writer')
+        writer.start()
+        try:
+            for game in self.parser.parse_file(pgn_path, self.min_rating):
+                if writer_errors:
+                    break
+                try:
+                    game_data = self._process_game(game, metadata.name)
+                    # Skip games where either player is below the minimum rating
+                    if (game_data.white_elo < self.min_rating or
+                        game_data.black_elo < self.min_rating):
+                        continue
+                    work_queue.put(game_data)
+                    games_processed = True
+                    total_games += 1
+                    last_game = game
+                except Exception as e:
+                    print(f"Error processing game: {e}")
+        finally:
+            work_queue.put(None)
+            writer.join()
+            self.repository.end_bulk()
+
+        if writer_errors:
+            raise writer_errors[0]
 
         # If at least one game was processed successfully, record the file import
         if games_processed:
@@ -114,45 +305,39 @@ class OpeningTreeService:
             )
 
     @staticmethod
-    def _get_player_rating(game: chess.pgn.Game, color: str) -> int:
-        """Extract player rating from game headers."""
+    def _parse_headers(headers: chess.pgn.Headers) -> tuple:
+        """Parse ratings and result from the headers in one pass per game.
+
+        Returns (result, white_elo, black_elo). Missing or empty Elo
+        headers parse to 0 without raising.
+        """
+        result = headers.get('Result', '*')
         try:
-            return int(game.headers.get(f'{color}Elo', '0'))
+            white_elo = int(headers.get('WhiteElo') or 0)
         except ValueError:
-            return 0
+            white_elo = 0
+        try:
+            black_elo = int(headers.get('BlackElo') or 0)
+        except ValueError:
+            black_elo = 0
+        return result, white_elo, black_elo
 
     @staticmethod
-    def _get_player_performance(game: chess.pgn.Game, color: str) -> int:
-        """Calculate player performance from game headers and result.
+    def _player_performance(result: str, is_white: bool, player_elo: int, opp_elo: int) -> int:
+        """Calculate player performance from the parsed result and ratings.
 
         For each player, performance is calculated based on opponent's rating and game result:
         - Win: opponent's rating + 400 (with floor of player's own rating)
         - Draw: opponent's rating
         - Loss: opponent's rating - 400 (with ceiling of player's own rating)
         """
-        try:
-            result = game.headers.get('Result', '*')
-            player_elo = int(game.headers.get(f'{color}Elo', '0'))
-            opp_color = 'Black' if color == 'White' else 'White'
-            opp_elo = int(game.headers.get(f'{opp_color}Elo', '0'))
-
-            # Determine if the player won, lost, or drew
-            if color == 'White':
-                if result == '1-0':  # White win
-                    return max(player_elo, opp_elo + 400)
-                elif result == '0-1':  # White loss
-                    return min(player_elo, opp_elo - 400)
-                else:  # Draw
-                    return opp_elo
-            else:  # color == 'Black'
-                if result == '0-1':  # Black win
-                    return max(player_elo, opp_elo + 400)
-                elif result == '1-0':  # Black loss
-                    return min(player_elo, opp_elo - 400)
-                else:  # Draw
-                    return opp_elo
-        except ValueError:
-            return 0
+        won = result == ('1-0' if is_white else '0-1')
+        lost = result == ('0-1' if is_white else '1-0')
+        if won:
+            return max(player_elo, opp_elo + 400)
+        if lost:
+            return min(player_elo, opp_elo - 400)
+        return opp_elo  # Draw
 
     def _process_game(self, game: chess.pgn.Game, pgn_name: str = '') -> GameData:
         """Process a single game and return structured game data."""
@@ -161,29 +346,29 @@ class OpeningTreeService:
         game_ref = f"{pgn_name}:{game_no}"
         ply_count = 0
 
-        # Extract player ratings and performance
-        white_elo = self._get_player_rating(game, 'White')
-        black_elo = self._get_player_rating(game, 'Black')
-        white_performance = self._get_player_performance(game, 'White')
-        black_performance = self._get_player_performance(game, 'Black')
+        # Extract player ratings and performance (headers parsed once)
+        result, white_elo, black_elo = self._parse_headers(game.headers)
+        white_performance = self._player_performance(result, True, white_elo, black_elo)
+        black_performance = self._player_performance(result, False, black_elo, white_elo)
 
-        for position_fen, move_san in self.parser.extract_moves(game):
+        # The side to move strictly alternates, so it is read from the
+        # first FEN and flipped per ply instead of re-parsed per move
+        is_white_to_move = None
+        for from_fen, to_fen, move_san in self.parser.extract_moves(game):
             if ply_count >= self.max_ply:
                 break
 
-            # Normalize FEN by keeping only the first 4 segments
-            from_position = normalise_fen(position_fen)
+            if is_white_to_move is None:
+                is_white_to_move = from_fen[from_fen.index(' ') + 1] == 'w'
 
-            # Create the next position to get its FEN
-            board = chess.Board(position_fen)
-            move = board.parse_san(move_san)
-            board.push(move)
-            to_position = normalise_fen(board.fen(en_passant='fen'))
+            # Normalise both endpoint FENs (validates the en-passant square)
+            from_position = normalise_fen(from_fen)
+            to_position = normalise_fen(to_fen)
 
-            moves.append(GameMove(from_position, to_position, move_san))
+            moves.append(GameMove(from_position, to_position, move_san, is_white_to_move))
+            is_white_to_move = not is_white_to_move
             ply_count += 1
 
-        result = game.headers.get('Result', '*')
         game_date = self._format_pgn_date(game.headers.get('Date', ''))
 
         return GameData(
@@ -207,43 +392,33 @@ class OpeningTreeService:
         - YYYY.??.?? -> YYYY
         - ????.??.?? -> ''
         """
-        if not pgn_date or '????' in pgn_date:
-            return ''
-
-        parts = pgn_date.split('.')
-        if len(parts) != 3:
-            return ''
-
-        # Convert valid parts to ISO format, stopping at first '??' encountered
-        valid_parts = [p for p in parts if p != '??']
-        if not valid_parts:
+        # PGN dates are fixed-width 'YYYY.MM.DD'; slice by offset instead
+        # of splitting into a list per game
+        if (len(pgn_date) != 10 or pgn_date[4] != '.' or pgn_date[7] != '.'
+                or pgn_date[:4] == '????'):
             return ''
 
-        return '-'.join(valid_parts)
+        if pgn_date[5:7] == '??':
+            return pgn_date[:4]
+        if pgn_date[8:10] == '??':
+            return f"{pgn_date[:4]}-{pgn_date[5:7]}"
+        return f"{pgn_date[:4]}-{pgn_date[5:7]}-{pgn_date[8:10]}"
 
     def _remove_en_passant_from_fen(self, fen: str) -> str:
-        """Remove en-passant information from a FEN string."""
-        fen_parts = fen.split()
-        if len(fen_parts) >= 4:
-            fen_parts[3] = '-'  # Set en-passant to none
-        return ' '.join(fen_parts[:4])
+        """Remove en-passant information from a normalized FEN string."""
+        # Normalized FENs carry exactly four fields with the en-passant
+        # square last, so one rsplit replaces it without a full split
+        return fen.rsplit(' ', 1)[0] + ' -'
 
     def _merge_moves(self, moves1: List[Dict[str, Any]], moves2: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Merge two lists of moves, aggregating statistics for matching moves."""
-        move_dict = {}
-        
-        # Process first set of moves
-        for move in moves1:
-            key = move['move']
-            move_dict[key] = move.copy()
-        
-        # Process second set of moves, add moves that haven't occurred in the first set
+        """Merge two lists of moves, keeping moves1's entry on a clash.
+
+        The repository builds a fresh dict per row, so the rows are
+        single-owner here and can be kept without defensive copies.
+        """
+        move_dict = {move['move']: move for move in moves1}
         for move in moves2:
-            key = move['move']
-            if key not in move_dict:
-                # Add new move
-                move_dict[key] = move.copy()
-        
+            move_dict.setdefault(move['move'], move)
         return list(move_dict.values())
 
     def query_position(self, fen: str) -> Dict[str, Any]:
@@ -264,9 +439,9 @@ class OpeningTreeService:
         # Get raw moves data for the original position
         moves = self.repository.get_moves_from_position(position['id'])
         
-        # Check if the original FEN has en-passant available
-        fen_parts = normalized_fen.split()
-        has_en_passant = len(fen_parts) >= 4 and fen_parts[3] != '-'
+        # Check if the original FEN has en-passant available; normalized
+        # FENs end with the en-passant field, so no split is needed
+        has_en_passant = not normalized_fen.endswith(' -')
         
         if has_en_passant:
             # Query the same position without en-passant
@@ -276,22 +451,11 @@ class OpeningTreeService:
             if no_ep_position:
                 # Get moves from the non-en-passant position
                 no_ep_moves = self.repository.get_moves_from_position(no_ep_position['id'])
-                
-                # Merge the two sets of moves
-                moves = self._merge_moves(moves, no_ep_moves)
-
-        # Transform the moves data
-        for move in moves:
-            # Calculate average rating and performance
-            move['rating'] = int(move['total_player_elo'] / move['total_games'])
-            move['performance'] = int(move['total_player_performance'] / move['total_games'])
 
-            # Remove raw data fields used for calculations
-            del move['total_player_elo']
-            del move['total_player_performance']
-
-        # Sort by total games descending
-        moves.sort(key=lambda x: x['total_games'], reverse=True)
+                # Merge the two sets of moves; merging interleaves the two
+                # pre-sorted lists, so only this path re-sorts
+                moves = self._merge_moves(moves, no_ep_moves)
+                moves.sort(key=lambda x: x['total_games'], reverse=True)
 
         return {
             "fen": position['fen'],
@@ -1,9 +1,4 @@
 import argparse
-from opening_tree.commands.build import build_tree
-from opening_tree.commands.prune import prune_tree
-from opening_tree.commands.query import query_tree
-from opening_tree.commands.serve import serve_tree
-from opening_tree.commands.normalise_fens import normalise_fens
 
 def main():
     parser = argparse.ArgumentParser(
@@ -132,15 +127,23 @@ def main():
 
     args = parser.parse_args()
 
+    # Each command module drags in its own heavy dependencies
+    # (python-chess, the HTTP stack, multiprocessing), so import only
+    # the branch that actually runs
     if args.command == "build":
+        from opening_tree.commands.build import build_tree
         build_tree(args)
     elif args.command == "prune":
+        from opening_tree.commands.prune import prune_tree
         prune_tree(args)
     elif args.command == "query":
+        from opening_tree.commands.query import query_tree
         query_tree(args)
     elif args.command == "serve":
+        from opening_tree.commands.serve import serve_tree
         serve_tree(args)
     elif args.command == "fix-fens":
+        from opening_tree.commands.normalise_fens import normalise_fens
         normalise_fens(args)
     elif not args.command:
         parser.print_help()
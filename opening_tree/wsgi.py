@@ -1,10 +1,21 @@
 from fastapi import FastAPI, HTTPException, Request
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.responses import JSONResponse
+from functools import lru_cache
 import os
+from types import MappingProxyType
 from typing import Dict, Any, List
 
 from opening_tree.service.api import OpeningTreeAPI, create_trees_from_config, load_config
 
+# Serialize responses with orjson when it is installed (same optional
+# dependency the threaded server uses); stdlib json otherwise
+try:
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as _ResponseClass
+except ImportError:
+    _ResponseClass = JSONResponse
+
 
 # Global API instance
 api: OpeningTreeAPI = None
@@ -21,9 +32,14 @@ def create_app(config_path: str = None) -> FastAPI:
     app = FastAPI(
         title="Opening Tree API",
         description="Chess opening tree analysis API",
-        version="1.0.0"
+        version="1.0.0",
+        default_response_class=_ResponseClass
     )
-    
+
+    # Move-list JSON is highly repetitive and compresses ~10x; level 1
+    # keeps the CPU cost negligible, and small bodies are sent as-is
+    app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=1)
+
     # Determine config path
     if config_path is None:
         config_path = os.getenv('OPENING_TREE_CONFIG')
@@ -31,24 +47,33 @@ def create_app(config_path: str = None) -> FastAPI:
     if not config_path:
         raise ValueError("No config file specified. Set OPENING_TREE_CONFIG environment variable or pass config_path.")
     
-    # Load configuration and create trees
-    trees = create_trees_from_config(config_path)
-    
+    # Load configuration and create trees. Built once at app creation
+    # and shared read-only by every handler thread (each thread lazily
+    # opens its own SQLite connection); the proxy makes any accidental
+    # mutation of the shared mapping fail loudly instead of racing.
+    trees = MappingProxyType(create_trees_from_config(config_path))
+
     # Create API instance
     api = OpeningTreeAPI(trees)
+
+    # Opening positions repeat heavily under UI navigation and the trees
+    # are immutable while serving, so cached query results never go
+    # stale; a hit skips the FEN normalisation and SQLite reads entirely
+    cached_query = lru_cache(maxsize=4096)(api.query_position)
     
+    # Handlers are deliberately plain 'def': they block on SQLite, and
+    # Starlette runs sync handlers on its threadpool so concurrent
+    # requests overlap instead of serializing the event loop
     @app.get("/")
-    async def list_trees(request: Request) -> List[Dict[str, Any]]:
+    def list_trees(request: Request) -> List[Dict[str, Any]]:
         """List available opening trees."""
-        # Construct base URL from request
+        # Construct base URL from request and reuse the shared API
+        # instance instead of building a throwaway one per request
         base_url = f"{request.url.scheme}://{request.url.netloc}"
-        
-        # Create a temporary API instance with the correct base URL
-        api_with_base_url = OpeningTreeAPI(api.trees, base_url)
-        return api_with_base_url.list_trees()
+        return api.list_trees(base_url=base_url)
     
     @app.get("/{tree_name}/{encoded_fen:path}")
-    async def query_position(tree_name: str, encoded_fen: str) -> Dict[str, Any]:
+    def query_position(tree_name: str, encoded_fen: str) -> Dict[str, Any]:
         """Query a position in a specific opening tree.
         
         Args:
@@ -58,7 +83,7 @@ def create_app(config_path: str = None) -> FastAPI:
         Returns:
             Position data with move statistics
         """
-        result, status_code, error_message = api.query_position(tree_name, encoded_fen)
+        result, status_code, error_message = cached_query(tree_name, encoded_fen)
         
         if status_code != 200:
             raise HTTPException(status_code=status_code, detail=error_message)
@@ -11,6 +11,7 @@ Or set environment variable:
 """
 
 import argparse
+import importlib.util
 import os
 import sys
 from pathlib import Path
@@ -38,7 +39,13 @@ def main():
     parser.add_argument(
         "--reload",
         action="store_true",
-        help="Enable auto-reload for development"
+        help="Enable auto-reload for development (forces a single worker)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of worker processes (default: CPU count)"
     )
     
     args = parser.parse_args()
@@ -67,29 +74,28 @@ def main():
     print(f"Starting Opening Tree API on {args.host}:{args.port}")
     print(f"Using config: {os.getenv('OPENING_TREE_CONFIG')}")
     
-    # Configure uvicorn for optimal performance
+    # Configure uvicorn for optimal performance. The served trees are
+    # read-only (each worker opens its own immutable connections and the
+    # kernel page cache is shared), so worker processes scale across
+    # cores; uvicorn only supports reload with a single worker.
     uvicorn_config = {
         "app": "opening_tree.wsgi:app",
         "host": args.host,
         "port": args.port,
         "reload": args.reload,
         "access_log": False,  # Disable access logging for performance
-        "workers": 1,  # Single worker for SQLite (no shared state)
+        "workers": 1 if args.reload else max(1, args.workers),
     }
     
-    # Add performance optimizations if available
-    try:
-        import uvloop
+    # Add performance optimizations if available. find_spec only checks
+    # that the package is importable; uvicorn imports it in each worker,
+    # so the launcher never pays the C-extension import cost itself.
+    if importlib.util.find_spec("uvloop"):
         uvicorn_config["loop"] = "uvloop"  # Faster event loop
-    except ImportError:
-        pass
-    
-    try:
-        import httptools
+
+    if importlib.util.find_spec("httptools"):
         uvicorn_config["http"] = "httptools"  # Faster HTTP parser
-    except ImportError:
-        pass
-    
+
     uvicorn.run(**uvicorn_config)
 
 if __name__ == "__main__":